@@ -1,17 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
-from sqlalchemy import or_
-from sqlalchemy.orm import Session, joinedload
-from app.auth.oauth2 import get_current_user
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Load, aliased, joinedload, selectinload
+from app.auth.oauth2 import Principal, get_current_principal
+from app.core.cache import ResponseCache, get_response_cache
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_PHOTO_BYTES, MAX_UPLOAD_BYTES
+from app.core.pagination import SortKey, paginate
+from app.core.ranges import binary_response
+from app.db.database import get_async_db
+from app.db.search import search_matches, supports_full_text_search, to_match_query
 from app.enums.category import CategoryEnum
 from app.enums.status import StatusEnum
 from app.models.advertisement import Advertisement, AdvertisementPhoto
+from app.models.rating import Rating
 from app.models.user import User
-from app.schemas.advertisement import StatusUpdate, AdvertisementResponse
-from typing import List, Optional
+from app.schemas.advertisement import (
+    StatusUpdate, AdvertisementResponse, AdvertisementPage, AdvertisementSummary, AdvertisementSummaryPage
+)
+from app.storage.blob_store import BlobNotFound, BlobStore, get_blob_store
+from app.storage.renditions import RENDITION_CONTENT_TYPE, generate_renditions
+from app.storage.uploads import UnsupportedImageType, UploadTooLarge, save_upload
+from typing import List, Literal, Optional, Union
 
 router = APIRouter()
 
+
+async def store_photo(photo: UploadFile, order: int, max_bytes: int, store: BlobStore) -> AdvertisementPhoto:
+    try:
+        upload = await run_in_threadpool(save_upload, store, photo.file, max_bytes)
+    except UnsupportedImageType:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported photo format. Allowed formats: JPEG, PNG, GIF, WebP"
+        )
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Photo is too large"
+        )
+
+    rendition_hashes = await generate_renditions(store, upload.key)
+
+    return AdvertisementPhoto(
+        content_hash=upload.key,
+        thumbnail_hash=rendition_hashes.get("thumb"),
+        medium_hash=rendition_hashes.get("medium"),
+        filename=photo.filename,
+        content_type=upload.content_type,
+        file_size=upload.size,
+        order=order
+    )
+
+
+async def store_photos(photos: List[UploadFile], store: BlobStore) -> List[AdvertisementPhoto]:
+    stored = []
+    remaining = MAX_UPLOAD_BYTES
+    for i, photo in enumerate(photos):
+        if not photo.filename:
+            continue
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Photos are too large in total"
+            )
+        photo_row = await store_photo(photo, i, min(MAX_PHOTO_BYTES, remaining), store)
+        remaining -= photo_row.file_size
+        stored.append(photo_row)
+    return stored
+
+
+async def load_advertisement(db: AsyncSession, id: int) -> Optional[Advertisement]:
+    """The advertisement with its photos, which responses always render and AsyncSession cannot lazy load."""
+    result = await db.execute(
+        select(Advertisement).options(joinedload(Advertisement.photos_rel)).where(Advertisement.id == id)
+    )
+    return result.unique().scalars().first()
+
+
+def summary_query():
+    first_photo = aliased(AdvertisementPhoto, name="first_photo")
+    first_photo_id = select(AdvertisementPhoto.id).where(
+        AdvertisementPhoto.advertisement_id == Advertisement.id
+    ).order_by(AdvertisementPhoto.order).limit(1).scalar_subquery()
+
+    return select(Advertisement, User, first_photo).join(Advertisement.owner).outerjoin(
+        first_photo, first_photo.id == first_photo_id
+    ).options(
+        Load(Advertisement).load_only(
+            Advertisement.id,
+            Advertisement.title,
+            Advertisement.price,
+            Advertisement.status,
+            Advertisement.category,
+            Advertisement.user_id
+        ),
+        Load(User).load_only(User.id, User.username, User.rating_sum, User.rating_count)
+    )
+
+
+def summarize(row) -> AdvertisementSummary:
+    advertisement, seller, photo = row
+    return AdvertisementSummary(
+        id=advertisement.id,
+        title=advertisement.title,
+        price=advertisement.price,
+        status=advertisement.status,
+        category=advertisement.category,
+        photo=photo,
+        seller=seller
+    )
+
+
 @router.post(
     "/",
     response_model=AdvertisementResponse,
@@ -24,8 +124,10 @@ async def create_advertisement(
         price: float = Form(...),
         category: CategoryEnum = Form(...),
         photos: List[UploadFile] = File(default=[]),
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db),
+        store: BlobStore = Depends(get_blob_store),
+        cache: ResponseCache = Depends(get_response_cache)
 ):
     if len(photos) > 5:
         raise HTTPException(
@@ -33,58 +135,74 @@ async def create_advertisement(
             detail="Maximum 5 photos allowed"
         )
 
+    stored_photos = await store_photos(photos, store)
+
     advertisement = Advertisement(
         title=title,
         description=description,
         price=price,
         user_id=current_user.id,
-        category=category
+        category=category,
+        photos_rel=stored_photos
     )
 
     db.add(advertisement)
-    db.commit()
-    db.refresh(advertisement)
-
-    for i, photo in enumerate(photos):
-        if photo.filename:
-            photo_bytes = await photo.read()
-
-            db_photo = AdvertisementPhoto(
-                advertisement_id=advertisement.id,
-                photo_data=photo_bytes,
-                filename=photo.filename,
-                content_type=photo.content_type or "image/jpeg",
-                file_size=len(photo_bytes),
-                order=i
-            )
-
-            db.add(db_photo)
-
-    db.commit()
-    db.refresh(advertisement)
+    await db.commit()
+    cache.invalidate("advertisements")
 
     return advertisement
 
 
 @router.get(
     "/all",
-    response_model=List[AdvertisementResponse],
+    response_model=Union[AdvertisementPage, AdvertisementSummaryPage],
     summary="Get All Advertisements",
-    description="Retrieve advertisements with filtering, searching and sorting."
+    description="Retrieve advertisements with filtering, searching and sorting. "
+                "Results are paginated; pass `next_cursor` back as `cursor` to fetch the next page. "
+                "`view=summary` returns only the fields a list card renders."
 )
 async def get_advertisements(
         category: Optional[CategoryEnum] = Query(None, description="Filter by category"),
         status: Optional[StatusEnum] = Query(None, description="Filter by status"),
         user_id: Optional[int] = Query(None, description="Filter by user id"),
         search: Optional[str] = Query(None, description="Search in title and description"),
-        sort_by: Optional[str] = Query("newest", description="Sort by date: newest, oldest"),
-        rating_sort: Optional[str] = Query(None, description="Sort by rating: rating_high, rating_low"),
-        db: Session = Depends(get_db)
+        sort_by: Optional[str] = Query(
+            None,
+            description="Sort by date: newest, oldest, or by search relevance: relevance. "
+                        "Defaults to relevance when searching and newest otherwise"
+        ),
+        rating_sort: Optional[str] = Query(
+            None,
+            description="Sort by seller rating: rating_high, rating_low. Ties keep the sort_by order"
+        ),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page"),
+        view: Literal["full", "summary"] = Query("full", description="Response shape: full or summary"),
+        db: AsyncSession = Depends(get_async_db),
+        cache: ResponseCache = Depends(get_response_cache)
 ):
-    query = db.query(Advertisement).options(
-        joinedload(Advertisement.photos_rel),
-        joinedload(Advertisement.owner).joinedload(User.reviews_received)
-    )
+    params = {
+        "category": category,
+        "status": status,
+        "user_id": user_id,
+        "search": search,
+        "sort_by": sort_by,
+        "rating_sort": rating_sort,
+        "limit": limit,
+        "cursor": cursor,
+        "view": view,
+    }
+    # Summary rows carry the seller's rating, and rating_sort orders by it, so both go stale on a new rating.
+    tags = ["advertisements", "ratings"] if rating_sort or view == "summary" else ["advertisements"]
+    cache_key = cache.key("advertisements:all", params, tags)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
+
+    if view == "summary":
+        query = summary_query()
+    else:
+        query = select(Advertisement).options(selectinload(Advertisement.photos_rel))
 
     if category:
         query = query.filter(Advertisement.category == category)
@@ -93,7 +211,14 @@ async def get_advertisements(
     if user_id:
         query = query.filter(Advertisement.user_id == user_id)
 
-    if search:
+    matches = None
+    if search and supports_full_text_search(db.bind):
+        match_query = to_match_query(search)
+        if match_query:
+            matches = search_matches(match_query)
+            query = query.join(matches, matches.c.advertisement_id == Advertisement.id)
+    if search and matches is None:
+        # No full-text index, or nothing FTS5 can tokenize (e.g. "-"): fall back to a substring match.
         search_term = f"%{search}%"
         query = query.filter(
             or_(
@@ -102,31 +227,61 @@ async def get_advertisements(
             )
         )
 
-    if sort_by == "oldest":
-        query = query.order_by(Advertisement.created_at.asc())
+    if sort_by in ("newest", "oldest"):
+        order = sort_by
+    elif matches is not None and sort_by in (None, "relevance"):
+        order = "relevance"
+    else:
+        order = "newest"
+
+    keys = []
+    if rating_sort in ("rating_high", "rating_low"):
+        if view == "full":
+            query = query.join(Advertisement.owner)
+        keys.append(SortKey(User.average_rating, rating_sort == "rating_high"))
+        order = f"{rating_sort}:{order}"
+
+    if order.endswith("relevance"):
+        keys.append(SortKey(matches.c.rank))
+        keys.append(SortKey(Advertisement.id))
     else:
-        query = query.order_by(Advertisement.created_at.desc())
+        descending = not order.endswith("oldest")
+        keys.append(SortKey(Advertisement.created_at, descending))
+        keys.append(SortKey(Advertisement.id, descending))
 
-    advertisements = query.all()
+    advertisements, next_cursor = await paginate(db, query, keys, order, limit, cursor)
 
-    if rating_sort == "rating_low":
-        advertisements.sort(key=lambda ad: ad.owner.average_rating)
-    elif rating_sort == "rating_high":
-        advertisements.sort(key=lambda ad: ad.owner.average_rating, reverse=True)
+    if view == "summary":
+        page = AdvertisementSummaryPage(items=[summarize(row) for row in advertisements], next_cursor=next_cursor)
+    else:
+        page = AdvertisementPage.model_validate({"items": advertisements, "next_cursor": next_cursor})
+    body = page.model_dump_json().encode("utf-8")
+    cache.set(cache_key, body)
 
-    return advertisements
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "MISS"})
 
 
 @router.get(
     "/{id}",
-    response_model=AdvertisementResponse,
+    response_model=Union[AdvertisementResponse, AdvertisementSummary],
     summary="Get Advertisement by ID",
     description="Retrieve a single advertisement by its ID. No authentication required."
 )
-async def get_advertisement_by_id(id: int, db: Session = Depends(get_db)):
-    advertisement = db.query(Advertisement).options(
-        joinedload(Advertisement.photos_rel)
-    ).filter(Advertisement.id == id).first()
+async def get_advertisement_by_id(
+        id: int,
+        view: Literal["full", "summary"] = Query("full", description="Response shape: full or summary"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    if view == "summary":
+        row = (await db.execute(summary_query().where(Advertisement.id == id))).first()
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Advertisement not found"
+            )
+        return summarize(row)
+
+    advertisement = await load_advertisement(db, id)
 
     if not advertisement:
         raise HTTPException(
@@ -137,6 +292,56 @@ async def get_advertisement_by_id(id: int, db: Session = Depends(get_db)):
     return advertisement
 
 
+@router.get(
+    "/{id}/photos/{photo_id}",
+    response_class=Response,
+    summary="Get Advertisement Photo",
+    description="Serve the raw bytes of an advertisement photo. Supports ETag revalidation and byte ranges."
+)
+async def get_advertisement_photo(
+        id: int,
+        photo_id: int,
+        request: Request,
+        size: Literal["original", "medium", "thumb"] = Query("original", description="Rendition to serve"),
+        v: Optional[str] = Query(None, description="Content version from the photo url"),
+        db: AsyncSession = Depends(get_async_db),
+        store: BlobStore = Depends(get_blob_store)
+):
+    photo = (await db.execute(select(AdvertisementPhoto).where(
+        AdvertisementPhoto.id == photo_id,
+        AdvertisementPhoto.advertisement_id == id
+    ))).scalars().first()
+
+    photo_not_found = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Photo not found"
+    )
+
+    if not photo:
+        raise photo_not_found
+
+    content_hash, content_type = photo.content_hash, photo.content_type
+    rendition_hash = {"thumb": photo.thumbnail_hash, "medium": photo.medium_hash}.get(size)
+    if rendition_hash:
+        content_hash, content_type = rendition_hash, RENDITION_CONTENT_TYPE
+
+    if v and not content_hash.startswith(v):
+        raise photo_not_found
+
+    try:
+        content_length = store.size(content_hash)
+    except BlobNotFound:
+        raise photo_not_found
+
+    return binary_response(
+        request,
+        lambda: store.open(content_hash),
+        content_length,
+        content_type,
+        f'"{content_hash}"'
+    )
+
+
 @router.put(
     "/{id}",
     response_model=AdvertisementResponse,
@@ -150,10 +355,12 @@ async def update_advertisement(
         price: float = Form(...),
         category: CategoryEnum = Form(...),
         photos: List[UploadFile] = File(default=[]),
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db),
+        store: BlobStore = Depends(get_blob_store),
+        cache: ResponseCache = Depends(get_response_cache)
 ):
-    advertisement = db.query(Advertisement).filter(Advertisement.id == id).first()
+    advertisement = await load_advertisement(db, id)
 
     if not advertisement:
         raise HTTPException(
@@ -173,32 +380,18 @@ async def update_advertisement(
             detail="Maximum 5 photos allowed"
         )
 
+    stored_photos = await store_photos(photos, store)
+
     advertisement.title = title
     advertisement.description = description
     advertisement.price = price
     advertisement.category = category
 
-    if photos and photos[0].filename:
-        db.query(AdvertisementPhoto).filter(
-            AdvertisementPhoto.advertisement_id == id
-        ).delete()
-
-        for i, photo in enumerate(photos):
-            photo_bytes = await photo.read()
-
-            db_photo = AdvertisementPhoto(
-                advertisement_id=id,
-                photo_data=photo_bytes,
-                filename=photo.filename,
-                content_type=photo.content_type or "image/jpeg",
-                file_size=len(photo_bytes),
-                order=i
-            )
-
-            db.add(db_photo)
+    if stored_photos:
+        advertisement.photos_rel = stored_photos
 
-    db.commit()
-    db.refresh(advertisement)
+    await db.commit()
+    cache.invalidate("advertisements")
     return advertisement
 
 
@@ -211,10 +404,11 @@ async def update_advertisement(
 async def update_advertisement_status(
         id: int,
         status_data: StatusUpdate,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db),
+        cache: ResponseCache = Depends(get_response_cache)
 ):
-    db_advertisement = db.query(Advertisement).filter(Advertisement.id == id).first()
+    db_advertisement = await load_advertisement(db, id)
 
     if not db_advertisement:
         raise HTTPException(
@@ -229,8 +423,8 @@ async def update_advertisement_status(
         )
 
     db_advertisement.status = status_data.new_status
-    db.commit()
-    db.refresh(db_advertisement)
+    await db.commit()
+    cache.invalidate("advertisements")
 
     return db_advertisement
 
@@ -243,10 +437,11 @@ async def update_advertisement_status(
 )
 async def buy_advertisement(
         id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db),
+        cache: ResponseCache = Depends(get_response_cache)
 ):
-    advertisement = db.query(Advertisement).filter(Advertisement.id == id).first()
+    advertisement = await load_advertisement(db, id)
 
     if not advertisement:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertisement not found")
@@ -259,8 +454,8 @@ async def buy_advertisement(
 
     advertisement.status = StatusEnum.SOLD
     advertisement.buyer_id = current_user.id
-    db.commit()
-    db.refresh(advertisement)
+    await db.commit()
+    cache.invalidate("advertisements")
 
     return advertisement
 
@@ -272,10 +467,11 @@ async def buy_advertisement(
 )
 async def delete_advertisement(
         id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db),
+        cache: ResponseCache = Depends(get_response_cache)
 ):
-    db_advertisement = db.query(Advertisement).filter(Advertisement.id == id).first()
+    db_advertisement = (await db.execute(select(Advertisement).where(Advertisement.id == id))).scalars().first()
 
     if not db_advertisement:
         raise HTTPException(
@@ -289,7 +485,20 @@ async def delete_advertisement(
             detail="You can only delete your own advertisements"
         )
 
-    db.delete(db_advertisement)
-    db.commit()
+    # The ad's ratings are deleted with it, so take them back out of the reviewed users' aggregates.
+    removed = await db.execute(
+        select(Rating.reviewed_user_id, func.sum(Rating.rating), func.count(Rating.id))
+        .where(Rating.advertisement_id == id)
+        .group_by(Rating.reviewed_user_id)
+    )
+    for reviewed_user_id, rating_sum, rating_count in removed.all():
+        await db.execute(update(User).where(User.id == reviewed_user_id).values(
+            rating_sum=User.rating_sum - rating_sum,
+            rating_count=User.rating_count - rating_count
+        ).execution_options(synchronize_session=False))
+
+    await db.delete(db_advertisement)
+    await db.commit()
+    cache.invalidate("advertisements", "ratings")
 
     return {"message": "Advertisement deleted successfully"}
\ No newline at end of file
@@ -1,40 +1,110 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.auth.oauth2 import get_current_principal
+from app.db.database import get_async_db, get_db
+from app.schemas.message import MessageCreate
+from app.websockets.codec import negotiate
 from app.websockets.connection_manager import manager
-import json
+from app.websockets.message_writer import PendingMessage, message_writer
+from app.websockets.replay import replay_missed_messages
 
 router = APIRouter()
 
 
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
+async def websocket_endpoint(
+        websocket: WebSocket,
+        user_id: int,
+        token: Optional[str] = Query(None),
+        last_seen_id: Optional[int] = Query(None, ge=0),
+        batch: bool = Query(False),
+        db: Session = Depends(get_db),
+        async_db: AsyncSession = Depends(get_async_db)
+):
     print(f"WebSocket connection attempt for user {user_id}")
 
-    try:
-        await manager.connect(websocket, user_id)
-        print(f"User {user_id} successfully connected to WebSocket")
+    sender_id = None
+    if token:
+        try:
+            sender_id = get_current_principal(token, db).id
+        except HTTPException:
+            sender_id = None
+        finally:
+            db.close()
+        if sender_id != user_id:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
+    replay = sender_id is not None and last_seen_id is not None
+    # Clients offer "msgpack" and/or "json" as subprotocols; sockets that offer neither speak JSON.
+    codec = negotiate(websocket.scope.get("subprotocols", []))
+    connection = await manager.connect(websocket, user_id, hold=replay, codec=codec, batch=batch)
+    if connection is None:
+        print(f"Rejected WebSocket for user {user_id}: connection limit reached")
+        return
+    print(f"User {user_id} successfully connected to WebSocket")
 
+    if replay:
+        # Live messages are held while the backlog streams, then released minus anything replayed.
+        try:
+            replayed_up_to = await replay_missed_messages(connection, async_db, user_id, last_seen_id)
+        finally:
+            await async_db.close()
+        if not connection.release(replayed_up_to):
+            await manager.evict(connection)
+            return
+
+    try:
         while True:
-            data = await websocket.receive_text()
-            print(f"Received data from user {user_id}: {data}")
+            try:
+                received = await asyncio.wait_for(websocket.receive(), timeout=manager.idle_timeout or None)
+            except asyncio.TimeoutError:
+                print(f"User {user_id} idle for {manager.idle_timeout}s, closing WebSocket")
+                await manager.evict(connection, status.WS_1001_GOING_AWAY, "Idle timeout")
+                return
+
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", status.WS_1000_NORMAL_CLOSURE))
+            data = received["text"] if received.get("text") is not None else received.get("bytes")
 
             try:
-                message_data = json.loads(data)
+                message_data = connection.codec.decode(data)
+
+                if message_data.get("type") == "pong":
+                    continue
 
+                print(f"Received data from user {user_id}: {data}")
                 if message_data.get("type") == "new_message":
-                    print(f"Processing new_message from user {user_id}")
-                    await manager.send_to_conversation(
-                        message_data,
-                        user_id,
-                        message_data.get("receiver_id")
-                    )
-            except json.JSONDecodeError as e:
-                print(f"Invalid JSON from user {user_id}: {e}")
+                    client_id = message_data.get("client_id")
+                    if sender_id is None:
+                        await manager.send(connection, {
+                            "type": "error",
+                            "client_id": client_id,
+                            "detail": "Connect with ?token= to send messages"
+                        })
+                        continue
+                    try:
+                        message = MessageCreate.model_validate(message_data)
+                    except ValidationError as e:
+                        await manager.send(connection, {
+                            "type": "error",
+                            "client_id": client_id,
+                            "detail": e.errors(include_url=False, include_context=False)
+                        })
+                        continue
+                    await message_writer.submit(PendingMessage(sender_id, message, connection, client_id))
+            except ValueError as e:
+                print(f"Invalid {connection.codec.name} frame from user {user_id}: {e}")
             except Exception as e:
                 print(f"Error processing message from user {user_id}: {e}")
 
     except WebSocketDisconnect:
         print(f"User {user_id} disconnected from WebSocket")
-        manager.disconnect(user_id)
+        await manager.disconnect(connection)
     except Exception as e:
         print(f"Unexpected error for user {user_id}: {e}")
-        manager.disconnect(user_id)
\ No newline at end of file
+        await manager.disconnect(connection)
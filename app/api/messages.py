@@ -1,52 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.auth.oauth2 import get_current_user
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects import postgresql, sqlite
+from app.auth.oauth2 import Principal, get_current_principal
+from app.core.config import MAX_PAGE_SIZE, MESSAGE_PAGE_SIZE
+from app.db.database import get_async_db
 from app.models.chat import Chat, ChatParticipant
 from app.models.message import Message
 from app.models.user import User
-from app.schemas.message import MessageCreate, MessageResponse, ConversationResponse
-from typing import List
+from app.schemas.message import MessageCreate, MessageResponse, ConversationResponse, ReadReceipt, ReadStateResponse
+from typing import List, Optional
 
 from app.websockets.connection_manager import manager
 
 router = APIRouter()
 
+DIALECT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
 
-def find_or_create_chat(user1_id: int, user2_id: int, db: Session) -> Chat:
-    chat = db.query(Chat).join(ChatParticipant).filter(
-        Chat.id.in_(
-            db.query(ChatParticipant.chat_id)
-            .filter(ChatParticipant.user_id.in_([user1_id, user2_id]))
-            .group_by(ChatParticipant.chat_id)
-            .having(func.count(ChatParticipant.user_id) == 2)
-        )
+
+def find_chat(user1_id: int, user2_id: int, db: Session) -> Optional[Chat]:
+    user_low_id, user_high_id = sorted((user1_id, user2_id))
+    return db.query(Chat).filter(
+        Chat.user_low_id == user_low_id,
+        Chat.user_high_id == user_high_id
     ).first()
 
-    if not chat:
-        chat = Chat()
-        db.add(chat)
-        db.flush()
 
-        db.add(ChatParticipant(chat_id=chat.id, user_id=user1_id))
-        db.add(ChatParticipant(chat_id=chat.id, user_id=user2_id))
-        db.commit()
+def insert_ignoring_conflicts(db: Session, table, *index_elements: str):
+    insert = DIALECT_INSERTS[db.get_bind().dialect.name]
+    return insert(table).on_conflict_do_nothing(index_elements=list(index_elements))
 
+
+def find_or_create_chat(user1_id: int, user2_id: int, db: Session) -> Chat:
+    chat = find_chat(user1_id, user2_id, db)
+    if chat:
+        return chat
+
+    # ON CONFLICT rather than a savepoint: pysqlite sends no BEGIN before SAVEPOINT, so releasing it would
+    # commit the chat on its own even if the caller's transaction later rolls back.
+    user_low_id, user_high_id = sorted((user1_id, user2_id))
+    created = db.execute(
+        insert_ignoring_conflicts(db, Chat.__table__, "user_low_id", "user_high_id"),
+        {"user_low_id": user_low_id, "user_high_id": user_high_id}
+    ).rowcount
+    # When another request created the chat for this pair first, the unique key makes it the only one.
+    chat = find_chat(user1_id, user2_id, db)
+    if created:
+        db.add_all([ChatParticipant(chat_id=chat.id, user_id=user_id) for user_id in {user_low_id, user_high_id}])
     return chat
 
 
+def new_message_event(db_message: Message, receiver_id: int) -> dict:
+    return {
+        "type": "new_message",
+        "message": {
+            "id": db_message.id,
+            "content": db_message.content,
+            "sender_id": db_message.sender_id,
+            "receiver_id": receiver_id,
+            "chat_id": db_message.chat_id,
+            "advertisement_id": db_message.advertisement_id,
+            "created_at": db_message.created_at.isoformat(),
+        }
+    }
+
+
 @router.post("/", response_model=MessageResponse)
 async def send_message(
         message: MessageCreate,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    receiver = db.query(User).filter(User.id == message.receiver_id).first()
+    receiver = (await db.execute(select(User.id).where(User.id == message.receiver_id))).first()
     if not receiver:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receiver not found")
 
-    chat = find_or_create_chat(current_user.id, message.receiver_id, db)
+    # The lookup-or-insert is shared with the WebSocket writer, which runs it on a plain Session.
+    chat = await db.run_sync(lambda session: find_or_create_chat(current_user.id, message.receiver_id, session))
 
     db_message = Message(
         chat_id=chat.id,
@@ -56,24 +87,10 @@ async def send_message(
     )
 
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-
-    websocket_message = {
-        "type": "new_message",
-        "message": {
-            "id": db_message.id,
-            "content": db_message.content,
-            "sender_id": db_message.sender_id,
-            "receiver_id": message.receiver_id,
-            "chat_id": db_message.chat_id,
-            "advertisement_id": db_message.advertisement_id,
-            "created_at": db_message.created_at.isoformat(),
-        }
-    }
+    await db.commit()
 
     await manager.send_to_conversation(
-        websocket_message,
+        new_message_event(db_message, message.receiver_id),
         current_user.id,
         message.receiver_id
     )
@@ -83,53 +100,142 @@ async def send_message(
 
 @router.get("/conversations", response_model=List[ConversationResponse])
 async def get_conversations(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    user_chats = db.query(Chat).join(ChatParticipant).filter(
-        ChatParticipant.user_id == current_user.id
-    ).all()
+    me = aliased(ChatParticipant)
+    other = aliased(ChatParticipant)
+
+    # Correlated per chat, so each lookup is one seek on ix_messages_chat_id_id rather than a pass over the history.
+    latest = aliased(Message)
+    last_message_id = select(func.max(latest.id)).where(latest.chat_id == me.chat_id).correlate(me).scalar_subquery()
+
+    reader = aliased(ChatParticipant)
+    unread_counts = select(
+        Message.chat_id,
+        func.count(Message.id).label("unread_count")
+    ).join(
+        reader, reader.chat_id == Message.chat_id
+    ).where(
+        reader.user_id == current_user.id,
+        Message.sender_id != current_user.id,
+        Message.id > func.coalesce(reader.last_read_message_id, 0)
+    ).group_by(Message.chat_id).subquery()
+
+    rows = (await db.execute(select(
+        me.chat_id,
+        User.id,
+        User.username,
+        Message.content,
+        Message.created_at,
+        func.coalesce(unread_counts.c.unread_count, 0)
+    ).select_from(me).join(
+        other, and_(other.chat_id == me.chat_id, other.user_id != me.user_id)
+    ).join(
+        User, User.id == other.user_id
+    ).join(
+        Message, Message.id == last_message_id
+    ).outerjoin(
+        unread_counts, unread_counts.c.chat_id == me.chat_id
+    ).where(
+        me.user_id == current_user.id
+    ).order_by(
+        Message.created_at.desc(), me.chat_id.desc()
+    ))).all()
+
+    return [
+        {
+            "chat_id": chat_id,
+            "other_user_id": other_user_id,
+            "other_username": other_username,
+            "last_message": last_message,
+            "last_message_time": last_message_time,
+            "unread_count": unread_count
+        }
+        for chat_id, other_user_id, other_username, last_message, last_message_time, unread_count in rows
+    ]
+
+
+@router.get(
+    "/conversation/{user_id}",
+    response_model=List[MessageResponse],
+    summary="Get Conversation",
+    description="Messages with a user in ascending order. Without a cursor the newest page is returned; "
+                "pass the first message id as `before_id` for older messages or the last one as `after_id` "
+                "to catch up on newer ones."
+)
+async def get_conversation(
+        user_id: int,
+        before_id: Optional[int] = Query(None, description="Return messages older than this message id"),
+        after_id: Optional[int] = Query(None, description="Return messages newer than this message id"),
+        limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db)
+):
+    if before_id is not None and after_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before_id or after_id, not both"
+        )
 
-    conversations = []
-    for chat in user_chats:
-        other_participant = db.query(ChatParticipant).filter(
-            ChatParticipant.chat_id == chat.id,
-            ChatParticipant.user_id != current_user.id
-        ).first()
+    chat = await db.run_sync(lambda session: find_chat(current_user.id, user_id, session))
+    if not chat:
+        return []
 
-        if other_participant:
-            other_user = other_participant.user
+    query = select(Message).where(Message.chat_id == chat.id)
 
-            last_message = db.query(Message).filter(
-                Message.chat_id == chat.id
-            ).order_by(Message.created_at.desc()).first()
+    if after_id is not None:
+        query = query.where(Message.id > after_id).order_by(Message.id.asc()).limit(limit)
+        return (await db.execute(query)).scalars().all()
 
-            if last_message:
-                conversations.append({
-                    "chat_id": chat.id,
-                    "other_user_id": other_user.id,
-                    "other_username": other_user.username,
-                    "last_message": last_message.content,
-                    "last_message_time": last_message.created_at,
-                    "unread_count": 0
-                })
+    if before_id is not None:
+        query = query.where(Message.id < before_id)
+    messages = (await db.execute(query.order_by(Message.id.desc()).limit(limit))).scalars().all()
 
-    return conversations
+    return messages[::-1]
 
 
-@router.get("/conversation/{user_id}", response_model=List[MessageResponse])
-async def get_conversation(
-        user_id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+@router.post(
+    "/chat/{chat_id}/read",
+    response_model=ReadStateResponse,
+    summary="Mark Chat as Read",
+    description="Advance the caller's read cursor to `message_id`, or to the newest message when omitted. "
+                "The cursor never moves backwards."
+)
+async def mark_chat_read(
+        chat_id: int,
+        receipt: Optional[ReadReceipt] = None,
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    chat = find_or_create_chat(current_user.id, user_id, db)
+    participant = (await db.execute(select(ChatParticipant).where(
+        ChatParticipant.chat_id == chat_id,
+        ChatParticipant.user_id == current_user.id
+    ))).scalars().first()
+
+    if not participant:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only read chats you participate in"
+        )
+
+    newest = select(func.max(Message.id)).where(Message.chat_id == chat_id)
+    if receipt and receipt.message_id is not None:
+        newest = newest.where(Message.id <= receipt.message_id)
+    message_id = await db.scalar(newest)
 
-    messages = db.query(Message).filter(
-        Message.chat_id == chat.id
-    ).order_by(Message.created_at.asc()).all()
+    if message_id is not None:
+        await db.execute(update(ChatParticipant).where(
+            ChatParticipant.id == participant.id,
+            or_(
+                ChatParticipant.last_read_message_id.is_(None),
+                ChatParticipant.last_read_message_id < message_id
+            )
+        ).values(last_read_message_id=message_id).execution_options(synchronize_session=False))
+        await db.commit()
+        await db.refresh(participant)
 
-    return messages
+    return {"chat_id": chat_id, "last_read_message_id": participant.last_read_message_id}
 
 
 @router.delete("/chat/{chat_id}",
@@ -138,13 +244,13 @@ async def get_conversation(
                )
 async def delete_chat(
         chat_id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    participant = db.query(ChatParticipant).filter(
+    participant = (await db.execute(select(ChatParticipant.id).where(
         ChatParticipant.chat_id == chat_id,
         ChatParticipant.user_id == current_user.id
-    ).first()
+    ))).first()
 
     if not participant:
         raise HTTPException(
@@ -152,14 +258,14 @@ async def delete_chat(
             detail="You can only delete chats you participate in"
         )
 
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    chat = await db.get(Chat, chat_id)
     if not chat:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chat not found"
         )
 
-    db.delete(chat)
-    db.commit()
+    await db.delete(chat)
+    await db.commit()
 
     return {"message": "Chat deleted successfully"}
\ No newline at end of file
@@ -1,8 +1,10 @@
 from typing import List
 from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.auth.oauth2 import get_current_user
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import ResponseCache, get_response_cache
+from app.db.database import get_async_db
+from app.auth.oauth2 import Principal, get_current_principal
 from app.models.user import User
 from app.models.rating import Rating
 from app.models.advertisement import Advertisement
@@ -21,13 +23,14 @@ router = APIRouter()
 )
 async def create_rating(
         rating: RatingCreate,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db),
+        cache: ResponseCache = Depends(get_response_cache)
 ):
     if current_user.id == rating.reviewed_user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Users cannot rate themselves")
 
-    advertisement = db.query(Advertisement).filter(Advertisement.id == rating.advertisement_id).first()
+    advertisement = await db.get(Advertisement, rating.advertisement_id)
     if not advertisement:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertisement not found")
 
@@ -39,11 +42,11 @@ async def create_rating(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="You can only rate users you had transactions with")
 
-    existing_rating = db.query(Rating).filter(
+    existing_rating = (await db.execute(select(Rating.id).where(
         Rating.reviewer_id == current_user.id,
         Rating.advertisement_id == rating.advertisement_id,
         Rating.reviewed_user_id == rating.reviewed_user_id
-    ).first()
+    ))).first()
 
     if existing_rating:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already rated this user")
@@ -57,8 +60,12 @@ async def create_rating(
     )
 
     db.add(db_rating)
-    db.commit()
-    db.refresh(db_rating)
+    await db.execute(update(User).where(User.id == rating.reviewed_user_id).values(
+        rating_sum=User.rating_sum + rating.rating,
+        rating_count=User.rating_count + 1
+    ).execution_options(synchronize_session=False))
+    await db.commit()
+    cache.invalidate("ratings")
     return db_rating
 
 
@@ -71,9 +78,9 @@ async def create_rating(
 )
 async def get_ratings_about_user(
         reviewed_user_id: int,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    ratings = db.query(Rating).filter(Rating.reviewed_user_id == reviewed_user_id).all()
+    ratings = (await db.execute(select(Rating).where(Rating.reviewed_user_id == reviewed_user_id))).scalars().all()
     return ratings
 
 
@@ -86,7 +93,7 @@ async def get_ratings_about_user(
 )
 async def get_ratings_by_user(
         reviewer_id: int,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    ratings = db.query(Rating).filter(Rating.reviewer_id == reviewer_id).all()
+    ratings = (await db.execute(select(Rating).where(Rating.reviewer_id == reviewer_id))).scalars().all()
     return ratings
\ No newline at end of file
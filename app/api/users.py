@@ -1,9 +1,11 @@
 from app.schemas.user import UserCreate, UserResponse
 from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.db.database import get_db
-from app.core.security import Hash
+from app.db.database import get_async_db, get_db
+from app.core import security
 
 router = APIRouter()
 
@@ -14,21 +16,20 @@ router = APIRouter()
     response_model=UserResponse,
     status_code=status.HTTP_201_CREATED
 )
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = (await db.execute(select(User.id).where(
         (User.username == user.username) | (User.email == user.email)
-    ).first()
+    ))).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username or email already exists"
         )
 
-    hashed_password = Hash.hash_password(user.password)
+    hashed_password = await security.hash_password(user.password)
     new_user = User(username=user.username, email=user.email, password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return new_user
 
@@ -1,39 +1,79 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 from app.auth import oauth2
-from app.auth.oauth2 import get_current_user
-from app.core.security import Hash
-from app.db.database import get_db
+from app.auth.oauth2 import Principal, get_current_principal
+from app.auth.refresh import issue_refresh_token, revoke_family, rotate_refresh_token
+from app.auth.revocation import revoked_tokens
+from app.core import security
+from app.db.database import get_async_db, get_db
 from app.models.user import User
+from app.schemas.auth import RefreshRequest
 
 router = APIRouter()
 
+
+def token_response(user: User, refresh_token: str, family_id: str) -> dict:
+    # uid lets handlers authorize from the token alone; sid ties the access token to its refresh family.
+    access_token = oauth2.create_access_token(data={'sub': user.username, 'uid': user.id, 'sid': family_id})
+
+    return {
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'token_type': 'bearer',
+        'expires_in': oauth2.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email
+        },
+    }
+
 @router.post('/login')
-def login(request: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == request.username).first()
+async def login(request: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.username == request.username))).scalars().first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Invalid credentials'
         )
-    if not Hash.verify_password(request.password, user.password):
+    verified, new_hash = await security.verify_and_update(request.password, user.password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Incorrect username or password'
         )
-    access_token = oauth2.create_access_token(data={'sub': user.username})
+    if new_hash is not None:
+        # Stored with a different BCRYPT_ROUNDS; upgrade it now that we have the plain password.
+        user.password = new_hash
 
-    return {
-        'access_token': access_token,
-        'token_type': 'bearer',
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email
-        },
-    }
+    refresh_token, family_id = await db.run_sync(issue_refresh_token, user.id)
+    await db.commit()
+    return token_response(user, refresh_token, family_id)
+
+@router.post('/refresh')
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    user_id, family_id, refresh_token = rotate_refresh_token(db, request.refresh_token)
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid refresh token'
+        )
+    return token_response(user, refresh_token, family_id)
 
 @router.post('/logout')
-def logout(current_user: User = Depends(get_current_user)):
-    return {"message": "Successfully logged out"}
\ No newline at end of file
+async def logout(
+        token: str = Depends(oauth2.oauth2_schema),
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_async_db)
+):
+    payload = oauth2.decode_access_token(token)
+    if payload.get('sid') is not None:
+        await db.run_sync(revoke_family, payload['sid'])
+        await db.commit()
+    if payload.get('jti') is not None:
+        await revoked_tokens.revoke(db, payload['jti'], payload['exp'])
+    return {"message": "Successfully logged out"}
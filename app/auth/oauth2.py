@@ -1,10 +1,13 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from dataclasses import dataclass
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
+from uuid import uuid4
 from jwt import PyJWTError
 from sqlalchemy.orm import Session
+from app.auth.revocation import revoked_tokens
 from app.db.database import get_db
 from app.models.user import User
 
@@ -17,28 +20,29 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
 
+    # Aware UTC: PyJWT reads a naive exp as UTC, which is off by the host's offset for datetime.now().
     if expires_delta:
-        expire = datetime.now() + expires_delta
+        expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now() + timedelta(minutes=15)
+        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_schema), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Could not validate credentials',
         headers={'WWW-Authenticate': 'Bearer'}
     )
 
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get('sub')
-        if username is None:
-            raise credentials_exception
+        if payload.get('sub') is None:
+            raise credentials_exception()
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -46,13 +50,36 @@ def get_current_user(token: str = Depends(oauth2_schema), db: Session = Depends(
             headers={'WWW-Authenticate': 'Bearer'}
         )
     except jwt.DecodeError:
-        raise credentials_exception
+        raise credentials_exception()
     except PyJWTError:
-        raise credentials_exception
+        raise credentials_exception()
+
+    if revoked_tokens.is_revoked(payload.get('jti')):
+        raise credentials_exception()
+
+    return payload
+
+@dataclass(frozen=True)
+class Principal:
+    """The caller as described by their access token: enough to authorize without loading the User row."""
+    id: int
+    username: str
+
+def get_current_principal(token: str = Depends(oauth2_schema), db: Session = Depends(get_db)) -> Principal:
+    payload = decode_access_token(token)
+    if payload.get('uid') is not None:
+        return Principal(id=payload['uid'], username=payload['sub'])
+
+    # Tokens issued before the uid claim existed still resolve through the user lookup.
+    user = get_current_user(token, db)
+    return Principal(id=user.id, username=user.username)
+
+def get_current_user(token: str = Depends(oauth2_schema), db: Session = Depends(get_db)):
+    username: str = decode_access_token(token)['sub']
 
     user = db.query(User).filter(User.username == username).first()
 
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
 
-    return user
\ No newline at end of file
+    return user
@@ -0,0 +1,64 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import REFRESH_TOKEN_EXPIRE_DAYS
+from app.models.refresh_token import RefreshToken
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: Optional[str] = None) -> Tuple[str, str]:
+    """Add a new refresh token to family_id, or start a family for a fresh login. Returns (token, family_id).
+
+    Only the token's hash is stored; the caller commits.
+    """
+    token = secrets.token_urlsafe(32)
+    family_id = family_id or secrets.token_hex(16)
+    db.add(RefreshToken(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id,
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token, family_id
+
+
+def revoke_family(db: Session, family_id: str):
+    db.query(RefreshToken).filter(RefreshToken.family_id == family_id).update(
+        {RefreshToken.revoked: True}, synchronize_session=False
+    )
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[int, str, str]:
+    """Spend a refresh token and issue its successor. Returns (user_id, family_id, new_token).
+
+    Every refresh token works once. Presenting one that was already spent means it leaked,
+    so the whole family is revoked and the legitimate client has to log in again.
+    """
+    invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    now = datetime.utcnow()
+    token_hash = hash_refresh_token(token)
+
+    stored = db.query(RefreshToken).filter(RefreshToken.token_hash == token_hash).first()
+    if stored is None or stored.revoked or stored.expires_at <= now:
+        raise invalid
+
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == token_hash,
+        RefreshToken.used_at.is_(None)
+    ).update({RefreshToken.used_at: now}, synchronize_session=False)
+    if not claimed:
+        revoke_family(db, stored.family_id)
+        db.commit()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reuse detected")
+
+    new_token, family_id = issue_refresh_token(db, stored.user_id, stored.family_id)
+    db.commit()
+    return stored.user_id, family_id, new_token
@@ -0,0 +1,119 @@
+import asyncio
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from loguru import logger
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import REVOCATION_SYNC_SECONDS
+from app.db.database import AsyncSessionLocal
+from app.models.revoked_token import RevokedToken
+from app.websockets.connection_manager import ConnectionManager, manager
+
+REVOCATION_TOPIC = "auth:revoked"
+PRUNE_INTERVAL_SECONDS = 60
+# Each sync re-reads this far behind the previous one, covering clock skew between workers and
+# revocations whose transaction committed after the previous sync had already run.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def utc_now() -> datetime:
+    """The current UTC time as the naive value the DateTime columns store."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RevocationList:
+    """Revoked token ids, kept in memory until the token would have expired anyway.
+
+    The revoked_tokens table is the durable copy. Revocations made on another worker arrive over
+    the backplane, and every REVOCATION_SYNC_SECONDS the table is re-read for ones recorded since
+    the last sync, so a publish lost while the hub was unreachable still takes effect.
+    Checking a token is a dict lookup.
+    """
+
+    def __init__(
+            self,
+            connections: ConnectionManager = manager,
+            session_factory=AsyncSessionLocal,
+            sync_interval: float = REVOCATION_SYNC_SECONDS
+    ):
+        self.connections = connections
+        self.session_factory = session_factory
+        self.sync_interval = sync_interval
+        self._expiry: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+        self._synced_through: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        async with self.session_factory() as db:
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= utc_now()))
+            await db.commit()
+        await self.sync()
+        await self.connections.listen(REVOCATION_TOPIC, self._on_revoked)
+        self.task = asyncio.create_task(self._resync())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def sync(self):
+        """Load unexpired revocations recorded since the last sync, or all of them on the first one."""
+        now = utc_now()
+        query = select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+        if self._synced_through is not None:
+            query = query.where(RevokedToken.revoked_at >= self._synced_through - SYNC_OVERLAP)
+        async with self.session_factory() as db:
+            rows = (await db.execute(query)).all()
+        for jti, expires_at in rows:
+            self.add(jti, calendar.timegm(expires_at.utctimetuple()))
+        self._synced_through = now
+
+    async def _resync(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"Failed to sync revoked tokens: {type(e).__name__}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+            self._synced_through = None
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        expires = self._expiry.get(jti) if jti is not None else None
+        return expires is not None and expires > time.time()
+
+    def add(self, jti: str, expires: float):
+        now = time.time()
+        with self._lock:
+            if now >= self._next_prune:
+                self._expiry = {key: value for key, value in self._expiry.items() if value > now}
+                self._next_prune = now + PRUNE_INTERVAL_SECONDS
+            self._expiry[jti] = expires
+
+    async def revoke(self, db: AsyncSession, jti: str, expires: float):
+        expires_at = datetime.fromtimestamp(expires, timezone.utc).replace(tzinfo=None)
+        await db.merge(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=utc_now()))
+        await db.commit()
+        self.add(jti, expires)
+        await self.connections.backplane.publish(REVOCATION_TOPIC, f"{jti} {expires}".encode("utf-8"))
+
+    async def _on_revoked(self, payload: bytes):
+        jti, expires = payload.decode("utf-8").split(" ")
+        self.add(jti, float(expires))
+
+
+revoked_tokens = RevocationList()
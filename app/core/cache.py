@@ -0,0 +1,155 @@
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import (
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_URL,
+)
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int):
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after their own TTL."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class InMemoryCache(CacheBackend):
+    """Per-process LRU. Only correct for a single worker; use a shared backend when running several."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self._entries = TTLCache(max_entries)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        values = []
+        for key in keys:
+            with self._lock:
+                counter = self._counters.get(key)
+            values.append(str(counter).encode() if counter is not None else self._entries.get(key))
+        return values
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self._entries.set(key, value, ttl)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisCache(CacheBackend):
+    def __init__(self, url: str = RESPONSE_CACHE_URL):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self.client = redis.Redis.from_url(url)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self.client.mget(keys)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(key, value, ex=ttl)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+
+class ResponseCache:
+    """Caches serialized responses under keys that embed the current version of each tag.
+
+    Invalidating a tag bumps its version, so every entry computed before the
+    write becomes unreachable at once and simply ages out of the backend.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, namespace: str, params: Dict[str, Any], tags: Iterable[str]) -> str:
+        tags = sorted(tags)
+        versions = self.backend.get_many([f"tag:{tag}" for tag in tags])
+        normalized = json.dumps(
+            {
+                "params": {name: value for name, value in sorted(params.items()) if value is not None},
+                "tags": {tag: (version or b"0").decode() for tag, version in zip(tags, versions)},
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return f"response:{namespace}:{hashlib.sha256(normalized.encode()).hexdigest()}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.backend.get_many([key])[0]
+
+    def set(self, key: str, value: bytes):
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, *tags: str):
+        for tag in tags:
+            self.backend.incr(f"tag:{tag}")
+
+
+def create_backend() -> CacheBackend:
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisCache()
+    return InMemoryCache()
+
+
+response_cache = ResponseCache(create_backend())
+
+
+def get_response_cache() -> ResponseCache:
+    return response_cache
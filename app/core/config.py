@@ -0,0 +1,43 @@
+import os
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MESSAGE_PAGE_SIZE = 50
+
+PHOTO_STORAGE_DIR = os.getenv("PHOTO_STORAGE_DIR", "./media/photos")
+
+THUMBNAIL_SIZE = (320, 320)
+MEDIUM_SIZE = (1024, 1024)
+RENDITION_WORKERS = int(os.getenv("RENDITION_WORKERS", "2"))
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "10"))
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+MAX_PHOTO_BYTES = int(os.getenv("MAX_PHOTO_BYTES", str(10 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+BACKPLANE_URL = os.getenv("BACKPLANE_URL", "")
+BACKPLANE_RECONNECT_SECONDS = float(os.getenv("BACKPLANE_RECONNECT_SECONDS", "1"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+# Seconds without a client frame before a socket is closed; 0 disables it. Only turn it on once every client
+# answers {"type": "ping"} with {"type": "pong"}. Half-open sockets are caught by uvicorn's protocol-level
+# pings (--ws-ping-interval/--ws-ping-timeout), which browsers answer without any client code.
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "0"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))
+WS_REPLAY_PAGE_SIZE = int(os.getenv("WS_REPLAY_PAGE_SIZE", "200"))
+WS_MAX_BATCH_EVENTS = int(os.getenv("WS_MAX_BATCH_EVENTS", "64"))
+
+MESSAGE_WRITE_BATCH_SIZE = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", "500"))
+MESSAGE_WRITE_BATCH_DELAY = float(os.getenv("MESSAGE_WRITE_BATCH_DELAY", "0.005"))
+MESSAGE_WRITE_QUEUE_SIZE = int(os.getenv("MESSAGE_WRITE_QUEUE_SIZE", "10000"))
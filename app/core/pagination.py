@@ -0,0 +1,88 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+
+class SortKey:
+    def __init__(self, expression, descending: bool = False):
+        self.expression = expression
+        self.descending = descending
+
+    @property
+    def ordering(self):
+        return self.expression.desc() if self.descending else self.expression.asc()
+
+    def after(self, value):
+        return self.expression < value if self.descending else self.expression > value
+
+    def decode(self, value):
+        if value is not None and isinstance(getattr(self.expression, "type", None), DateTime):
+            return datetime.fromisoformat(value)
+        return value
+
+
+def invalid_cursor() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_cursor(scope: str, values: Sequence[Any]) -> str:
+    payload = {
+        "s": scope,
+        "v": [value.isoformat() if isinstance(value, datetime) else value for value in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, scope: str, keys: Sequence[SortKey]) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+        if payload["s"] != scope or len(values) != len(keys):
+            raise invalid_cursor()
+        return [key.decode(value) for key, value in zip(keys, values)]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise invalid_cursor()
+
+
+def keyset_filter(keys: Sequence[SortKey], values: Sequence[Any]):
+    clauses = []
+    for i, key in enumerate(keys):
+        conditions = [previous.expression == value for previous, value in zip(keys[:i], values[:i])]
+        conditions.append(key.after(values[i]))
+        clauses.append(and_(*conditions))
+    return or_(*clauses)
+
+
+async def paginate(
+        db: AsyncSession,
+        statement: Select,
+        keys: Sequence[SortKey],
+        scope: str,
+        limit: int,
+        cursor: Optional[str] = None
+) -> Tuple[list, Optional[str]]:
+    if cursor:
+        statement = statement.where(keyset_filter(keys, decode_cursor(cursor, scope, keys)))
+
+    width = len(statement.column_descriptions)
+    statement = statement.add_columns(*[key.expression.label(f"sort_key_{i}") for i, key in enumerate(keys)])
+    result = await db.execute(statement.order_by(*[key.ordering for key in keys]).limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(scope, list(rows[-1][width:]))
+
+    if width == 1:
+        return [row[0] for row in rows], next_cursor
+    return [tuple(row[:width]) for row in rows], next_cursor
@@ -1,12 +1,70 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from fastapi.security import HTTPBearer
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import BCRYPT_ROUNDS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_RETRY_AFTER, PASSWORD_HASH_WORKERS
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
 class Hash:
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
 
     def hash_password(password: str) -> str:
-        return pwd_context.hash(password)
\ No newline at end of file
+        return pwd_context.hash(password)
+
+    def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, and return a fresh hash as well when the stored one used other bcrypt rounds."""
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _run_hashing(function: Callable, *args):
+    """Run bcrypt in the hashing pool, turning requests away with 503 once PASSWORD_HASH_MAX_PENDING are waiting.
+
+    Keeping bcrypt out of the threadpool means a login burst cannot starve the other sync endpoints,
+    and the cap keeps the backlog, and with it login latency, bounded.
+    """
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, please retry",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+        )
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_pool(), function, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run_hashing(Hash.hash_password, password)
+
+
+async def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hashing(Hash.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,140 @@
+from typing import Optional, Set
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+from app.db.database import Base, engine
+from app.db.search import ensure_search_index
+from app.models import advertisement, chat, message, rating, refresh_token, revoked_token, user  # noqa: F401 - register tables on Base.metadata
+from app.storage.blob_store import BlobStore, get_blob_store
+
+BATCH_SIZE = 200
+
+
+def add_missing_columns(connection: Connection) -> Set[str]:
+    added = set()
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+            added.add(f"{table.name}.{column.name}")
+    return added
+
+
+def create_missing_indexes(connection: Connection):
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+
+
+def rebuild_table(connection: Connection, table_name: str):
+    """Recreate a table from its current model definition, keeping the columns both versions share.
+
+    SQLite cannot drop columns or relax constraints in place, so this follows the
+    create-copy-drop-rename procedure from the SQLite ALTER TABLE documentation.
+    """
+    table = Base.metadata.tables[table_name]
+    old_columns = {column["name"] for column in inspect(connection).get_columns(table_name)}
+    shared = ", ".join(f'"{column.name}"' for column in table.columns if column.name in old_columns)
+
+    metadata = MetaData()
+    for foreign_key in table.foreign_keys:
+        if foreign_key.column.table.name not in metadata.tables:
+            foreign_key.column.table.to_metadata(metadata)
+    new_table = table.to_metadata(metadata, name=f"{table_name}_new")
+    connection.execute(CreateTable(new_table))
+    connection.execute(text(f"INSERT INTO {new_table.name} ({shared}) SELECT {shared} FROM {table_name}"))
+    connection.execute(text(f"DROP TABLE {table_name}"))
+    connection.execute(text(f"ALTER TABLE {new_table.name} RENAME TO {table_name}"))
+
+
+def migrate_photos_to_blob_store(connection: Connection, store: BlobStore):
+    inspector = inspect(connection)
+    if not inspector.has_table("advertisement_photos"):
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("advertisement_photos")}
+    if "photo_data" not in columns:
+        return
+
+    if "content_hash" not in columns:
+        connection.execute(text("ALTER TABLE advertisement_photos ADD COLUMN content_hash VARCHAR(64)"))
+
+    last_id = 0
+    while True:
+        rows = connection.execute(text(
+            "SELECT id, photo_data FROM advertisement_photos "
+            "WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        for photo_id, photo_data in rows:
+            connection.execute(
+                text("UPDATE advertisement_photos SET content_hash = :hash WHERE id = :id"),
+                {"hash": store.put(photo_data), "id": photo_id}
+            )
+        last_id = rows[-1][0]
+
+    rebuild_table(connection, "advertisement_photos")
+
+
+def backfill_rating_aggregates(connection: Connection):
+    connection.execute(text(
+        "UPDATE users SET "
+        "rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM ratings WHERE ratings.reviewed_user_id = users.id), "
+        "rating_count = (SELECT COUNT(*) FROM ratings WHERE ratings.reviewed_user_id = users.id)"
+    ))
+
+
+DUPLICATE_CHATS = (
+    "SELECT id FROM chats WHERE user_low_id IS NOT NULL AND EXISTS ("
+    "SELECT 1 FROM chats AS kept WHERE kept.user_low_id = chats.user_low_id "
+    "AND kept.user_high_id = chats.user_high_id AND kept.id < chats.id)"
+)
+
+
+def backfill_chat_pairs(connection: Connection):
+    """Fill the canonical participant pair of 1:1 chats and merge chats that share a pair into the oldest one."""
+    connection.execute(text(
+        "UPDATE chats SET "
+        "user_low_id = (SELECT MIN(user_id) FROM chat_participants WHERE chat_id = chats.id), "
+        "user_high_id = (SELECT MAX(user_id) FROM chat_participants WHERE chat_id = chats.id) "
+        "WHERE (SELECT COUNT(*) FROM chat_participants WHERE chat_id = chats.id) = 2"
+    ))
+    connection.execute(text(
+        "UPDATE messages SET chat_id = ("
+        "SELECT MIN(kept.id) FROM chats AS kept JOIN chats AS duplicate "
+        "ON kept.user_low_id = duplicate.user_low_id AND kept.user_high_id = duplicate.user_high_id "
+        "WHERE duplicate.id = messages.chat_id"
+        f") WHERE chat_id IN ({DUPLICATE_CHATS})"
+    ))
+    connection.execute(text(f"DELETE FROM chat_participants WHERE chat_id IN ({DUPLICATE_CHATS})"))
+    connection.execute(text(f"DELETE FROM chats WHERE id IN ({DUPLICATE_CHATS})"))
+
+
+def run_migrations(engine: Engine, store: Optional[BlobStore] = None):
+    with engine.begin() as connection:
+        migrate_photos_to_blob_store(connection, store or get_blob_store())
+        added = add_missing_columns(connection)
+        if "users.rating_count" in added:
+            backfill_rating_aggregates(connection)
+        if "chats.user_low_id" in added:
+            backfill_chat_pairs(connection)
+        create_missing_indexes(connection)
+        ensure_search_index(connection)
+
+
+if __name__ == "__main__":
+    run_migrations(engine)
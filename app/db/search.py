@@ -0,0 +1,73 @@
+import re
+from typing import Optional
+
+from sqlalchemy import DDL, Float, Integer, column, event, inspect, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+
+from app.models.advertisement import Advertisement
+
+SEARCH_INDEX = "advertisements_fts"
+
+CREATE_SEARCH_INDEX = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX} USING fts5("
+    "title, description, content='advertisements', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_INDEX}_ai AFTER INSERT ON advertisements BEGIN "
+    f"INSERT INTO {SEARCH_INDEX}(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_INDEX}_ad AFTER DELETE ON advertisements BEGIN "
+    f"INSERT INTO {SEARCH_INDEX}({SEARCH_INDEX}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_INDEX}_au AFTER UPDATE OF title, description ON advertisements BEGIN "
+    f"INSERT INTO {SEARCH_INDEX}({SEARCH_INDEX}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    f"INSERT INTO {SEARCH_INDEX}(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+]
+
+search_index = table(SEARCH_INDEX, column("rowid", Integer), column("rank", Float))
+
+for statement in CREATE_SEARCH_INDEX:
+    event.listen(Advertisement.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    Advertisement.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {SEARCH_INDEX}").execute_if(dialect="sqlite")
+)
+
+
+def supports_full_text_search(connection) -> bool:
+    return connection.dialect.name == "sqlite"
+
+
+def ensure_search_index(connection: Connection):
+    if not supports_full_text_search(connection) or not inspect(connection).has_table("advertisements"):
+        return
+
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": SEARCH_INDEX}
+    ).first()
+
+    for statement in CREATE_SEARCH_INDEX:
+        connection.execute(text(statement))
+
+    if not exists:
+        connection.execute(text(f"INSERT INTO {SEARCH_INDEX}({SEARCH_INDEX}) VALUES ('rebuild')"))
+
+
+def to_match_query(search: str) -> Optional[str]:
+    """Turn free text into an FTS5 query that requires every word, each matched as a prefix."""
+    terms = re.findall(r"\w+", search.lower())
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_matches(match_query: str):
+    return select(
+        search_index.c.rowid.label("advertisement_id"),
+        search_index.c.rank.label("rank")
+    ).where(literal_column(SEARCH_INDEX).match(match_query)).subquery()
@@ -1,10 +1,9 @@
 from app.db.database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Enum, LargeBinary
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Enum, Index
 from datetime import datetime
 from sqlalchemy.orm import relationship
 from app.enums.category import CategoryEnum
 from app.enums.status import StatusEnum
-import base64
 from typing import List
 
 class Advertisement(Base):
@@ -24,26 +23,41 @@ class Advertisement(Base):
     owner = relationship("User", foreign_keys="[Advertisement.user_id]", back_populates="advertisements")
     buyer = relationship("User", foreign_keys="[Advertisement.buyer_id]", back_populates="purchases")
     ratings = relationship("Rating", back_populates="advertisement", cascade="all, delete-orphan")
-    photos_rel = relationship("AdvertisementPhoto", back_populates="advertisement", cascade="all, delete-orphan")
+    photos_rel = relationship(
+        "AdvertisementPhoto",
+        back_populates="advertisement",
+        cascade="all, delete-orphan",
+        order_by="AdvertisementPhoto.order"
+    )
+
+    __table_args__ = (
+        Index("ix_advertisements_created_at_id", "created_at", "id"),
+        Index("ix_advertisements_category_status_created_at", "category", "status", "created_at"),
+        Index("ix_advertisements_status_created_at", "status", "created_at"),
+        Index("ix_advertisements_user_id_created_at", "user_id", "created_at"),
+        Index("ix_advertisements_buyer_id", "buyer_id"),
+    )
 
     @property
-    def photos(self) -> List[str]:
-        photo_list = []
-        for photo in self.photos_rel:
-            base64_photo = base64.b64encode(photo.photo_data).decode('utf-8')
-            photo_list.append(f"data:{photo.content_type};base64,{base64_photo}")
-        return photo_list
+    def photos(self) -> List["AdvertisementPhoto"]:
+        return list(self.photos_rel)
 
 class AdvertisementPhoto(Base):
     __tablename__ = "advertisement_photos"
 
     id = Column(Integer, primary_key=True, index=True)
     advertisement_id = Column(Integer, ForeignKey("advertisements.id", ondelete="CASCADE"), nullable=False)
-    photo_data = Column(LargeBinary, nullable=False)
+    content_hash = Column(String(64), nullable=False, index=True)
+    thumbnail_hash = Column(String(64), nullable=True)
+    medium_hash = Column(String(64), nullable=True)
     filename = Column(String(255), nullable=False)
     content_type = Column(String(50), nullable=False)
     file_size = Column(Integer, nullable=False)
     order = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.now)
 
-    advertisement = relationship("Advertisement", back_populates="photos_rel")
\ No newline at end of file
+    advertisement = relationship("Advertisement", back_populates="photos_rel")
+
+    __table_args__ = (
+        Index("ix_advertisement_photos_advertisement_id_order", "advertisement_id", "order"),
+    )
\ No newline at end of file
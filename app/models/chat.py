@@ -1,5 +1,5 @@
 from app.db.database import Base
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint, Index
 from datetime import datetime
 from sqlalchemy.orm import relationship
 
@@ -8,12 +8,18 @@ class Chat(Base):
     __tablename__ = "chats"
 
     id = Column(Integer, primary_key=True, index=True)
+    user_low_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    user_high_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
     participants = relationship("ChatParticipant", back_populates="chat", cascade="all, delete-orphan")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ux_chats_user_low_id_user_high_id", "user_low_id", "user_high_id", unique=True),
+    )
+
 
 class ChatParticipant(Base):
     __tablename__ = "chat_participants"
@@ -21,9 +27,13 @@ class ChatParticipant(Base):
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_read_message_id = Column(Integer, nullable=True)
     joined_at = Column(DateTime, default=datetime.now)
 
     chat = relationship("Chat", back_populates="participants")
     user = relationship("User")
 
-    __table_args__ = (UniqueConstraint('chat_id', 'user_id'),)
\ No newline at end of file
+    __table_args__ = (
+        UniqueConstraint('chat_id', 'user_id'),
+        Index("ix_chat_participants_user_id", "user_id"),
+    )
\ No newline at end of file
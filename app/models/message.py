@@ -1,5 +1,5 @@
 from app.db.database import Base
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Text, Index
 from datetime import datetime
 from sqlalchemy.orm import relationship
 
@@ -15,4 +15,9 @@ class Message(Base):
     advertisement_id = Column(Integer, ForeignKey("advertisements.id"), nullable=True)
 
     chat = relationship("Chat", back_populates="messages")
-    sender = relationship("User")
\ No newline at end of file
+    sender = relationship("User")
+
+    __table_args__ = (
+        Index("ix_messages_chat_id_created_at", "chat_id", "created_at"),
+        Index("ix_messages_chat_id_id", "chat_id", "id"),
+    )
\ No newline at end of file
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -17,4 +17,10 @@ class Rating(Base):
 
     reviewer = relationship("User", foreign_keys=[reviewer_id], back_populates="reviews_given")
     reviewed_user = relationship("User", foreign_keys=[reviewed_user_id], back_populates="reviews_received")
-    advertisement = relationship("Advertisement", back_populates="ratings")
\ No newline at end of file
+    advertisement = relationship("Advertisement", back_populates="ratings")
+
+    __table_args__ = (
+        Index("ix_ratings_reviewed_user_id", "reviewed_user_id"),
+        Index("ix_ratings_reviewer_id_advertisement_id", "reviewer_id", "advertisement_id"),
+        Index("ix_ratings_advertisement_id", "advertisement_id"),
+    )
\ No newline at end of file
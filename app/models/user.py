@@ -1,6 +1,7 @@
 from app.db.database import Base
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Float, case, cast
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
 class User(Base):
@@ -12,19 +13,24 @@ class User(Base):
     password = Column(String)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     advertisements = relationship("Advertisement", foreign_keys="[Advertisement.user_id]", back_populates="owner")
     purchases = relationship("Advertisement", foreign_keys="[Advertisement.buyer_id]", back_populates="buyer")
     reviews_given = relationship("Rating", foreign_keys="[Rating.reviewer_id]", back_populates="reviewer")
     reviews_received = relationship("Rating", foreign_keys="[Rating.reviewed_user_id]", back_populates="reviewed_user")
 
-    @property
+    @hybrid_property
     def average_rating(self) -> float:
-        if not self.reviews_received:
+        if not self.rating_count:
             return 0.0
-        total = sum(review.rating for review in self.reviews_received)
-        return round(total / len(self.reviews_received), 1)
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @average_rating.expression
+    def average_rating(cls):
+        return case((cls.rating_count > 0, cast(cls.rating_sum, Float) / cls.rating_count), else_=0.0)
 
     @property
     def total_reviews(self) -> int:
-        return len(self.reviews_received)
\ No newline at end of file
+        return self.rating_count
\ No newline at end of file
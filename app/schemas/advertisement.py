@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, computed_field
+from typing import ClassVar, Optional, List
 from datetime import datetime
 from app.enums.category import CategoryEnum
 from app.enums.status import StatusEnum
@@ -10,7 +10,42 @@ class AdvertisementBase(BaseModel):
     description: str = Field(..., min_length=1, max_length=2000)
     price: float = Field(..., gt=0)
     category: CategoryEnum
-    photos: List[str] = []
+
+class PhotoResponse(BaseModel):
+    id: int
+    advertisement_id: int
+    content_type: str
+    file_size: int
+    order: int
+    content_hash: str = Field(..., exclude=True)
+    thumbnail_hash: Optional[str] = Field(None, exclude=True)
+    medium_hash: Optional[str] = Field(None, exclude=True)
+    model_config = ConfigDict(from_attributes=True)
+
+    size: ClassVar[str] = "original"
+
+    def _url(self, size: str) -> str:
+        content_hash = {"thumb": self.thumbnail_hash, "medium": self.medium_hash}.get(size) or self.content_hash
+        url = f"/advertisements/{self.advertisement_id}/photos/{self.id}?"
+        if size != "original":
+            url += f"size={size}&"
+        return url + f"v={content_hash[:16]}"
+
+    @computed_field
+    @property
+    def url(self) -> str:
+        return self._url(self.size)
+
+    @computed_field
+    @property
+    def original_url(self) -> str:
+        return self._url("original")
+
+class ThumbnailPhotoResponse(PhotoResponse):
+    size: ClassVar[str] = "thumb"
+
+class MediumPhotoResponse(PhotoResponse):
+    size: ClassVar[str] = "medium"
 
 class AdvertisementCreate(AdvertisementBase):
     pass
@@ -31,4 +66,33 @@ class AdvertisementResponse(AdvertisementBase):
     buyer_id: Optional[int] = None
     status: StatusEnum
     created_at: datetime
+    photos: List[MediumPhotoResponse] = []
+    model_config = ConfigDict(from_attributes=True)
+
+class AdvertisementListItem(AdvertisementResponse):
+    photos: List[ThumbnailPhotoResponse] = []
+
+class AdvertisementPage(BaseModel):
+    items: List[AdvertisementListItem]
+    next_cursor: Optional[str] = None
+
+
+class SellerSummary(BaseModel):
+    id: int
+    username: str
+    average_rating: float
+    total_reviews: int
     model_config = ConfigDict(from_attributes=True)
+
+class AdvertisementSummary(BaseModel):
+    id: int
+    title: str
+    price: float
+    status: StatusEnum
+    category: CategoryEnum
+    photo: Optional[ThumbnailPhotoResponse] = None
+    seller: SellerSummary
+
+class AdvertisementSummaryPage(BaseModel):
+    items: List[AdvertisementSummary]
+    next_cursor: Optional[str] = None
@@ -9,4 +9,7 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     user_id: int = Field(..., gt=0)
-    username: str = Field(..., min_length=1)
\ No newline at end of file
+    username: str = Field(..., min_length=1)
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1)
@@ -33,4 +33,11 @@ class ConversationResponse(BaseModel):
     other_username: str = Field(..., min_length=1)
     last_message: str = Field(..., min_length=1)
     last_message_time: datetime
-    unread_count: int = Field(default=0, ge=0)
\ No newline at end of file
+    unread_count: int = Field(default=0, ge=0)
+
+class ReadReceipt(BaseModel):
+    message_id: Optional[int] = Field(None, gt=0)
+
+class ReadStateResponse(BaseModel):
+    chat_id: int
+    last_read_message_id: Optional[int] = None
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from app.core.config import PHOTO_STORAGE_DIR
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+class BlobWriter(ABC):
+    """Receives a blob in chunks; commit() files it under its content hash."""
+
+    @abstractmethod
+    def write(self, chunk: bytes):
+        ...
+
+    @abstractmethod
+    def commit(self) -> str:
+        ...
+
+    @abstractmethod
+    def abort(self):
+        ...
+
+
+class BlobStore(ABC):
+    """Content-addressed storage: blobs are keyed by the SHA-256 hex digest of their bytes."""
+
+    @abstractmethod
+    def writer(self) -> BlobWriter:
+        ...
+
+    def put(self, data: bytes) -> str:
+        writer = self.writer()
+        try:
+            writer.write(data)
+            return writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def keys(self) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    def last_used(self, key: str) -> float:
+        ...
+
+
+class FileSystemBlobWriter(BlobWriter):
+    def __init__(self, store: "FileSystemBlobStore"):
+        self.store = store
+        self.digest = hashlib.sha256()
+        store.root.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp_name = tempfile.mkstemp(dir=store.root, prefix=".upload-")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def commit(self) -> str:
+        key = self.digest.hexdigest()
+        path = self.store.path(key)
+
+        if path.exists():
+            self.abort()
+            os.utime(path)
+            return key
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.tmp_name, path)
+        return key
+
+    def abort(self):
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.tmp_name):
+            os.unlink(self.tmp_name)
+
+
+class FileSystemBlobStore(BlobStore):
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+            raise BlobNotFound(key)
+        return self.root / key[:2] / key[2:4] / key
+
+    def writer(self) -> BlobWriter:
+        return FileSystemBlobWriter(self)
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return open(self.path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def size(self, key: str) -> int:
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def exists(self, key: str) -> bool:
+        try:
+            return self.path(key).exists()
+        except BlobNotFound:
+            return False
+
+    def delete(self, key: str):
+        try:
+            self.path(key).unlink()
+        except (FileNotFoundError, BlobNotFound):
+            pass
+
+    def keys(self) -> Iterator[str]:
+        if not self.root.exists():
+            return
+        for path in self.root.glob("??/??/*"):
+            if not path.name.startswith("."):
+                yield path.name
+
+    def last_used(self, key: str) -> float:
+        try:
+            return self.path(key).stat().st_mtime
+        except FileNotFoundError:
+            return time.time()
+
+
+blob_store = FileSystemBlobStore(PHOTO_STORAGE_DIR)
+
+
+def get_blob_store() -> BlobStore:
+    return blob_store
@@ -0,0 +1,64 @@
+import time
+
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.models.advertisement import AdvertisementPhoto
+from app.storage.blob_store import BlobStore, get_blob_store
+from app.storage.renditions import store_renditions
+
+ORPHAN_GRACE_SECONDS = 60 * 60
+
+
+def prune_orphaned_blobs(db: Session, store: BlobStore, grace_seconds: int = ORPHAN_GRACE_SECONDS) -> int:
+    """Delete blobs no photo row references any more.
+
+    Blobs are shared between identical uploads, so they are never removed inline
+    with a photo row. The grace period protects blobs written by uploads whose
+    transaction has not committed yet.
+    """
+    referenced = set()
+    for hashes in db.query(
+            AdvertisementPhoto.content_hash,
+            AdvertisementPhoto.thumbnail_hash,
+            AdvertisementPhoto.medium_hash
+    ):
+        referenced.update(hashes)
+    cutoff = time.time() - grace_seconds
+
+    removed = 0
+    for key in list(store.keys()):
+        if key not in referenced and store.last_used(key) < cutoff:
+            store.delete(key)
+            removed += 1
+
+    return removed
+
+
+def generate_missing_renditions(db: Session, store: BlobStore) -> int:
+    photos = db.query(AdvertisementPhoto).filter(
+        AdvertisementPhoto.thumbnail_hash.is_(None) | AdvertisementPhoto.medium_hash.is_(None)
+    ).all()
+
+    updated = 0
+    for photo in photos:
+        rendition_hashes = store_renditions(store, photo.content_hash)
+        if "thumb" in rendition_hashes:
+            photo.thumbnail_hash = rendition_hashes["thumb"]
+        if "medium" in rendition_hashes:
+            photo.medium_hash = rendition_hashes["medium"]
+        if rendition_hashes:
+            updated += 1
+            db.commit()
+
+    return updated
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        store = get_blob_store()
+        print(f"Generated renditions for {generate_missing_renditions(db, store)} photos")
+        print(f"Removed {prune_orphaned_blobs(db, store)} orphaned blobs")
+    finally:
+        db.close()
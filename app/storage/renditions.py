@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.core.config import MEDIUM_SIZE, RENDITION_WORKERS, THUMBNAIL_SIZE
+from app.storage.blob_store import BlobNotFound, BlobStore
+
+RENDITION_SIZES = {
+    "thumb": THUMBNAIL_SIZE,
+    "medium": MEDIUM_SIZE,
+}
+RENDITION_CONTENT_TYPE = "image/webp"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def render_variants(source: BinaryIO) -> Dict[str, bytes]:
+    """Decode an uploaded image and return the downscaled renditions that are smaller than it.
+
+    Data Pillow cannot decode yields no renditions, and callers fall back to the original.
+    """
+    try:
+        with Image.open(source) as image:
+            image.draft("RGB", max(RENDITION_SIZES.values()))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+            variants = {}
+            for name, size in RENDITION_SIZES.items():
+                if image.width <= size[0] and image.height <= size[1]:
+                    continue
+                variant = image.copy()
+                variant.thumbnail(size, Image.Resampling.LANCZOS)
+                output = BytesIO()
+                variant.save(output, format="WEBP", quality=80)
+                variants[name] = output.getvalue()
+            return variants
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+        return {}
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=RENDITION_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def store_renditions(store: BlobStore, key: str) -> Dict[str, str]:
+    """Render the renditions of a stored blob and store them, returning their keys.
+
+    Runs inside the rendition process pool and reads the original from the store
+    itself, so the upload never has to be held in memory by the request.
+    """
+    try:
+        with store.open(key) as blob:
+            variants = render_variants(blob)
+    except BlobNotFound:
+        return {}
+    return {name: store.put(data) for name, data in variants.items()}
+
+
+async def generate_renditions(store: BlobStore, key: str) -> Dict[str, str]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), store_renditions, store, key)
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from app.storage.blob_store import BlobStore
+
+CHUNK_SIZE = 64 * 1024
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+class UnsupportedImageType(Exception):
+    pass
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    key: str
+    size: int
+    content_type: str
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    for signature, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def save_upload(store: BlobStore, source: BinaryIO, max_bytes: int) -> StoredUpload:
+    """Copy an upload into the blob store chunk by chunk, never holding more than one chunk in memory."""
+    chunk = source.read(CHUNK_SIZE)
+    content_type = sniff_image_type(chunk)
+    if content_type is None:
+        raise UnsupportedImageType()
+
+    writer = store.writer()
+    size = 0
+    try:
+        while chunk:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge()
+            writer.write(chunk)
+            chunk = source.read(CHUNK_SIZE)
+        key = writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+    return StoredUpload(key=key, size=size, content_type=content_type)
@@ -0,0 +1,170 @@
+import asyncio
+import struct
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from app.core.config import BACKPLANE_RECONNECT_SECONDS, BACKPLANE_URL
+
+Deliver = Callable[[str, bytes], Awaitable[None]]
+
+SUBSCRIBE = 1
+UNSUBSCRIBE = 2
+PUBLISH = 3
+
+HEADER = struct.Struct(">BHI")
+
+
+def encode_frame(op: int, topic: str, payload: bytes = b"") -> bytes:
+    topic_bytes = topic.encode("utf-8")
+    return HEADER.pack(op, len(topic_bytes), len(payload)) + topic_bytes + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, str, bytes]:
+    op, topic_length, payload_length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    topic = (await reader.readexactly(topic_length)).decode("utf-8")
+    payload = await reader.readexactly(payload_length)
+    return op, topic, payload
+
+
+class Backplane(ABC):
+    """Routes published payloads to whichever worker subscribed to the topic."""
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def subscribe(self, topic: str):
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, topic: str):
+        ...
+
+    @abstractmethod
+    async def publish(self, topic: str, payload: bytes):
+        ...
+
+
+class InMemoryBackplane(Backplane):
+    """Single-process backplane: every subscriber lives in this worker."""
+
+    def __init__(self):
+        super().__init__()
+        self.topics: Set[str] = set()
+
+    async def subscribe(self, topic: str):
+        self.topics.add(topic)
+
+    async def unsubscribe(self, topic: str):
+        self.topics.discard(topic)
+
+    async def publish(self, topic: str, payload: bytes):
+        if topic in self.topics and self.deliver is not None:
+            await self.deliver(topic, payload)
+
+
+class HubBackplane(Backplane):
+    """Connects to the TCP hub in app.websockets.hub, which forwards each publish to the subscribed workers.
+
+    Subscriptions are replayed after a reconnect; payloads published while the hub is
+    unreachable are dropped, the same as a send to a closed socket.
+    """
+
+    def __init__(self, host: str, port: int, reconnect_seconds: float = BACKPLANE_RECONNECT_SECONDS):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.reconnect_seconds = reconnect_seconds
+        self.topics: Set[str] = set()
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.connected = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        self.task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self.connected.wait(), timeout=self.reconnect_seconds * 5)
+        except asyncio.TimeoutError:
+            logger.warning(f"Backplane hub {self.host}:{self.port} is not reachable yet")
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def subscribe(self, topic: str):
+        if topic not in self.topics:
+            self.topics.add(topic)
+            await self._send(encode_frame(SUBSCRIBE, topic))
+
+    async def unsubscribe(self, topic: str):
+        if topic in self.topics:
+            self.topics.discard(topic)
+            await self._send(encode_frame(UNSUBSCRIBE, topic))
+
+    async def publish(self, topic: str, payload: bytes):
+        await self._send(encode_frame(PUBLISH, topic, payload))
+
+    async def _send(self, frame: bytes):
+        writer = self.writer
+        if writer is None:
+            return
+        try:
+            writer.write(frame)
+            await writer.drain()
+        except (ConnectionError, OSError):
+            writer.close()
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+
+            for topic in self.topics:
+                writer.write(encode_frame(SUBSCRIBE, topic))
+            self.writer = writer
+            self.connected.set()
+
+            try:
+                while True:
+                    op, topic, payload = await read_frame(reader)
+                    if op == PUBLISH and self.deliver is not None:
+                        try:
+                            await self.deliver(topic, payload)
+                        except Exception as e:
+                            # One bad frame must not stop delivery of everything after it.
+                            logger.error(f"Failed to deliver backplane frame on {topic!r}: {type(e).__name__}: {e}")
+            except (asyncio.IncompleteReadError, ConnectionError, OSError):
+                logger.warning(f"Lost connection to backplane hub {self.host}:{self.port}, reconnecting")
+            finally:
+                self.writer = None
+                self.connected.clear()
+                writer.close()
+
+            await asyncio.sleep(self.reconnect_seconds)
+
+
+def create_backplane(url: str = BACKPLANE_URL) -> Backplane:
+    if not url:
+        return InMemoryBackplane()
+    parsed = urlparse(url)
+    if parsed.scheme == "tcp":
+        return HubBackplane(parsed.hostname or "127.0.0.1", parsed.port or 8765)
+    raise ValueError(f"Unsupported BACKPLANE_URL: {url}")
@@ -0,0 +1,96 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+import msgpack
+
+
+class Codec(ABC):
+    """Wire format of one socket, negotiated through the Sec-WebSocket-Protocol header."""
+
+    name: str
+    binary: bool
+
+    @abstractmethod
+    def encode(self, event: dict) -> bytes:
+        ...
+
+    @abstractmethod
+    def decode(self, data) -> dict:
+        ...
+
+    @abstractmethod
+    def batch(self, frames: List[bytes]) -> bytes:
+        """Wrap already-encoded events in one {"type": "batch", "events": [...]} frame without re-encoding them."""
+        ...
+
+
+class JsonCodec(Codec):
+    name = "json"
+    binary = False
+
+    def encode(self, event: dict) -> bytes:
+        return json.dumps(event).encode("utf-8")
+
+    def decode(self, data) -> dict:
+        return json.loads(data)
+
+    def batch(self, frames: List[bytes]) -> bytes:
+        return b'{"type": "batch", "events": [' + b", ".join(frames) + b"]}"
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    binary = True
+
+    def encode(self, event: dict) -> bytes:
+        return msgpack.packb(event)
+
+    def decode(self, data) -> dict:
+        return msgpack.unpackb(data)
+
+    def batch(self, frames: List[bytes]) -> bytes:
+        count = len(frames)
+        if count < 16:
+            array_header = bytes([0x90 | count])
+        elif count < 1 << 16:
+            array_header = b"\xdc" + count.to_bytes(2, "big")
+        else:
+            array_header = b"\xdd" + count.to_bytes(4, "big")
+        # A two-entry map whose "events" value is the array of pre-encoded frames.
+        prefix = b"\x82" + msgpack.packb("type") + msgpack.packb("batch") + msgpack.packb("events")
+        return prefix + array_header + b"".join(frames)
+
+
+JSON = JsonCodec()
+CODECS: Dict[str, Codec] = {JSON.name: JSON, MsgpackCodec.name: MsgpackCodec()}
+
+
+def negotiate(offered: Iterable[str]) -> Optional[Codec]:
+    """The first offered subprotocol this server speaks, or None to fall back to JSON without a subprotocol."""
+    for name in offered:
+        codec = CODECS.get(name.strip())
+        if codec is not None:
+            return codec
+    return None
+
+
+class Frames:
+    """One event, encoded at most once per codec however many sockets it is sent to.
+
+    Backplane payloads are always JSON, so a JSON socket gets the published bytes as they are.
+    """
+
+    def __init__(self, event: Optional[dict] = None, payload: Optional[bytes] = None):
+        self.event = event
+        self.encoded: Dict[str, bytes] = {}
+        if payload is not None:
+            self.encoded[JSON.name] = payload
+
+    def get(self, codec: Codec) -> bytes:
+        frame = self.encoded.get(codec.name)
+        if frame is None:
+            if self.event is None:
+                self.event = JSON.decode(self.encoded[JSON.name])
+            frame = self.encoded[codec.name] = codec.encode(self.event)
+        return frame
@@ -1,29 +1,257 @@
-from typing import List, Dict
-from fastapi import WebSocket
-import json
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from fastapi import WebSocket, status
+
+from app.core.config import (
+    WS_IDLE_TIMEOUT, WS_MAX_BATCH_EVENTS, WS_MAX_CONNECTIONS, WS_PING_INTERVAL, WS_SEND_QUEUE_SIZE
+)
+from app.websockets.backplane import Backplane, create_backplane
+from app.websockets.codec import JSON, Codec, Frames
+
+
+PING = {"type": "ping"}
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def message_id(event: dict) -> Optional[int]:
+    if isinstance(event, dict) and event.get("type") == "new_message":
+        return event["message"]["id"]
+    return None
+
+
+class Connection:
+    """One client socket with its own bounded outbound queue, drained by a dedicated writer task."""
+
+    def __init__(
+            self,
+            websocket: WebSocket,
+            user_id: int,
+            queue_size: int = WS_SEND_QUEUE_SIZE,
+            hold: bool = False,
+            codec: Codec = JSON,
+            batch_size: int = 1
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue_size = queue_size
+        self.codec = codec
+        self.batch_size = batch_size
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.held: Optional[List[bytes]] = [] if hold else None
+        self.closed = asyncio.Event()
+
+    def start(self):
+        self.writer = asyncio.create_task(self._write())
+
+    def offer(self, payload: bytes) -> bool:
+        if self.held is not None:
+            if len(self.held) >= self.queue_size:
+                return False
+            self.held.append(payload)
+            return True
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    @property
+    def full(self) -> bool:
+        if self.held is not None:
+            return len(self.held) >= self.queue_size
+        return self.queue.full()
+
+    async def push(self, payload: bytes) -> bool:
+        """Queue a payload ahead of anything held, waiting for room instead of failing.
+
+        Returns False once the connection is closed, so a long stream cannot wait on a dead writer.
+        """
+        put = asyncio.ensure_future(self.queue.put(payload))
+        closed = asyncio.ensure_future(self.closed.wait())
+        await asyncio.wait({put, closed}, return_when=asyncio.FIRST_COMPLETED)
+        closed.cancel()
+        if not put.done():
+            put.cancel()
+            return False
+        return True
+
+    def release(self, replayed_up_to: int) -> bool:
+        """Stop holding live payloads and queue the held ones, skipping messages a replay already sent."""
+        held, self.held = self.held or [], None
+        for payload in held:
+            held_id = message_id(self.codec.decode(payload))
+            if held_id is not None and held_id <= replayed_up_to:
+                continue
+            if not self.offer(payload):
+                return False
+        return True
+
+    def encode(self, event: dict) -> bytes:
+        return self.codec.encode(event)
+
+    async def _write(self):
+        while True:
+            frames = [await self.queue.get()]
+            # A client that has fallen behind gets its backlog in as few frames as possible.
+            while len(frames) < self.batch_size and not self.queue.empty():
+                frames.append(self.queue.get_nowait())
+            payload = frames[0] if len(frames) == 1 else self.codec.batch(frames)
+            try:
+                if self.codec.binary:
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload.decode("utf-8"))
+            except Exception:
+                self.closed.set()
+                return
+
+    async def stop(self):
+        self.closed.set()
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+            try:
+                await self.writer
+            except asyncio.CancelledError:
+                pass
+
+    async def close(self, code: int, reason: str):
+        await self.stop()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, WebSocket] = {}
+    def __init__(
+            self,
+            backplane: Optional[Backplane] = None,
+            queue_size: int = WS_SEND_QUEUE_SIZE,
+            ping_interval: float = WS_PING_INTERVAL,
+            idle_timeout: float = WS_IDLE_TIMEOUT,
+            max_connections: int = WS_MAX_CONNECTIONS,
+            max_batch_events: int = WS_MAX_BATCH_EVENTS
+    ):
+        self.active_connections: Dict[int, Set[Connection]] = {}
+        self.listeners: Dict[str, Callable[[bytes], Awaitable[None]]] = {}
+        self.backplane = backplane or create_backplane()
+        self.queue_size = queue_size
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_batch_events = max_batch_events
+        self.connection_count = 0
+        self.heartbeat: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.backplane.start(self.deliver)
+        self.heartbeat = asyncio.create_task(self._heartbeat())
+
+    async def close(self):
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+            try:
+                await self.heartbeat
+            except asyncio.CancelledError:
+                pass
+            self.heartbeat = None
+        await self.backplane.close()
 
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await self.sweep()
 
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    async def sweep(self):
+        """Evict connections whose queue is full. When idle_timeout is set, also queue a ping on every
+        connection, which clients answer with a pong frame to stay connected."""
+        ping = Frames(PING) if self.idle_timeout > 0 else None
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections):
+                stuck = connection.full if ping is None else not connection.offer(ping.get(connection.codec))
+                if stuck:
+                    asyncio.create_task(self.evict(connection))
+
+    async def listen(self, topic: str, handler: Callable[[bytes], Awaitable[None]]):
+        """Hand every payload published to a non-user topic, from any worker, to handler."""
+        self.listeners[topic] = handler
+        await self.backplane.subscribe(topic)
+
+    async def connect(
+            self,
+            websocket: WebSocket,
+            user_id: int,
+            hold: bool = False,
+            codec: Optional[Codec] = None,
+            batch: bool = False
+    ) -> Optional[Connection]:
+        """Accept the socket, speaking codec if the client negotiated one and JSON otherwise."""
+        if self.connection_count >= self.max_connections:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return None
+
+        await websocket.accept(subprotocol=codec.name if codec is not None else None)
+        self.connection_count += 1
+        connection = Connection(
+            websocket, user_id, self.queue_size, hold,
+            codec=codec or JSON,
+            batch_size=self.max_batch_events if batch else 1
+        )
+        connection.start()
+        connections = self.active_connections.setdefault(user_id, set())
+        connections.add(connection)
+        if len(connections) == 1:
+            await self.backplane.subscribe(user_topic(user_id))
+        return connection
+
+    async def disconnect(self, connection: Connection):
+        await connection.stop()
+        connections = self.active_connections.get(connection.user_id)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        self.connection_count -= 1
+        if not connections:
+            del self.active_connections[connection.user_id]
+            await self.backplane.unsubscribe(user_topic(connection.user_id))
+
+    async def evict(
+            self,
+            connection: Connection,
+            code: int = status.WS_1008_POLICY_VIOLATION,
+            reason: str = "Slow consumer"
+    ):
+        await self.disconnect(connection)
+        await connection.close(code, reason)
+
+    async def send(self, connection: Connection, message: dict):
+        if not connection.offer(connection.encode(message)):
+            asyncio.create_task(self.evict(connection))
 
     async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            try:
-                await websocket.send_text(json.dumps(message))
-            except:
-                self.disconnect(user_id)
+        await self.backplane.publish(user_topic(user_id), JSON.encode(message))
+
+    async def deliver(self, topic: str, payload: bytes):
+        listener = self.listeners.get(topic)
+        if listener is not None:
+            await listener(payload)
+            return
+        user_id = int(topic.split(":", 1)[1])
+        frames = Frames(payload=payload)
+        for connection in list(self.active_connections.get(user_id, ())):
+            if not connection.offer(frames.get(connection.codec)):
+                # The client is not keeping up; dropping it keeps delivery latency flat for everyone else.
+                asyncio.create_task(self.evict(connection))
 
     async def send_to_conversation(self, message: dict, sender_id: int, receiver_id: int):
-        await self.send_personal_message(message, sender_id)
-        await self.send_personal_message(message, receiver_id)
+        payload = JSON.encode(message)
+        await asyncio.gather(
+            self.backplane.publish(user_topic(sender_id), payload),
+            self.backplane.publish(user_topic(receiver_id), payload)
+        )
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
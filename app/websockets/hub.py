@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from typing import Dict, Set
+
+from app.websockets.backplane import PUBLISH, SUBSCRIBE, UNSUBSCRIBE, encode_frame, read_frame
+
+
+DRAIN_TIMEOUT_SECONDS = 5
+
+
+class Hub:
+    """Forwards every published frame to the workers subscribed to its topic."""
+
+    def __init__(self, drain_timeout: float = DRAIN_TIMEOUT_SECONDS):
+        self.subscribers: Dict[str, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self.drain_timeout = drain_timeout
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        topics = set()
+        try:
+            while True:
+                op, topic, payload = await read_frame(reader)
+                if op == SUBSCRIBE:
+                    topics.add(topic)
+                    self.subscribers[topic].add(writer)
+                elif op == UNSUBSCRIBE:
+                    topics.discard(topic)
+                    self._remove(topic, writer)
+                elif op == PUBLISH:
+                    await self.publish(topic, payload)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            for topic in topics:
+                self._remove(topic, writer)
+            writer.close()
+
+    async def publish(self, topic: str, payload: bytes):
+        """Buffer the frame for every subscriber before waiting on any, so one stalled worker does not
+        hold up the others; a worker that has not drained within drain_timeout is disconnected."""
+        frame = encode_frame(PUBLISH, topic, payload)
+        subscribers = list(self.subscribers.get(topic, ()))
+        for subscriber in subscribers:
+            subscriber.write(frame)
+        await asyncio.gather(*(self._drain(subscriber) for subscriber in subscribers))
+
+    async def _drain(self, writer: asyncio.StreamWriter):
+        try:
+            await asyncio.wait_for(writer.drain(), timeout=self.drain_timeout)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            # The worker resubscribes when it reconnects.
+            for topic in list(self.subscribers):
+                self._remove(topic, writer)
+            writer.close()
+
+    def _remove(self, topic: str, writer: asyncio.StreamWriter):
+        subscribers = self.subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(writer)
+            if not subscribers:
+                del self.subscribers[topic]
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(Hub().handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WebSocket backplane hub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,152 @@
+import asyncio
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from app.api.messages import find_or_create_chat, new_message_event
+from app.core.config import MESSAGE_WRITE_BATCH_DELAY, MESSAGE_WRITE_BATCH_SIZE, MESSAGE_WRITE_QUEUE_SIZE
+from app.db.database import SessionLocal
+from app.models.message import Message
+from app.models.user import User
+from app.schemas.message import MessageCreate
+from app.websockets.connection_manager import Connection, ConnectionManager, manager
+
+
+@dataclass
+class PendingMessage:
+    sender_id: int
+    message: MessageCreate
+    connection: Connection
+    client_id: Optional[str] = None
+
+
+class MessageWriter:
+    """Write-behind for messages sent over WebSockets.
+
+    Messages queued within MESSAGE_WRITE_BATCH_DELAY of each other, across all chats,
+    are inserted in one transaction. Each sender is acked and the message fanned out
+    only after that transaction has committed.
+    """
+
+    def __init__(
+            self,
+            connections: ConnectionManager = manager,
+            session_factory=SessionLocal,
+            batch_size: int = MESSAGE_WRITE_BATCH_SIZE,
+            batch_delay: float = MESSAGE_WRITE_BATCH_DELAY,
+            queue_size: int = MESSAGE_WRITE_QUEUE_SIZE
+    ):
+        self.connections = connections
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue_size = queue_size
+        self.queue: Optional["asyncio.Queue[Optional[PendingMessage]]"] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Flush everything already queued, then stop."""
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def submit(self, pending: PendingMessage):
+        await self.queue.put(pending)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                try:
+                    pending = await asyncio.wait_for(self.queue.get(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if pending is None:
+                    stopping = True
+                    break
+                batch.append(pending)
+
+            results = await loop.run_in_executor(None, self.write, batch)
+            await self._publish(batch, results)
+
+    def write(self, batch: List[PendingMessage]) -> List[Union[dict, str]]:
+        """Write the batch in one transaction, falling back to one transaction per entry if it fails,
+        so a single bad row only rejects its own message."""
+        try:
+            return self.write_batch(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning(f"Batch of {len(batch)} WebSocket messages failed, retrying one by one: "
+                               f"{type(e).__name__}: {e}")
+                return [result for pending in batch for result in self.write([pending])]
+            logger.error(f"Failed to write WebSocket message from user {batch[0].sender_id}: {type(e).__name__}: {e}")
+            return ["Message could not be saved"]
+
+    def write_batch(self, batch: List[PendingMessage]) -> List[Union[dict, str]]:
+        """Insert a batch in a single transaction; returns the new_message event or an error per entry."""
+        db: Session = self.session_factory()
+        try:
+            receiver_ids = {pending.message.receiver_id for pending in batch}
+            existing = {user_id for user_id, in db.query(User.id).filter(User.id.in_(receiver_ids))}
+
+            chat_ids = {}
+            rows: List[Optional[Message]] = []
+            for pending in batch:
+                receiver_id = pending.message.receiver_id
+                if receiver_id not in existing:
+                    rows.append(None)
+                    continue
+                pair = tuple(sorted((pending.sender_id, receiver_id)))
+                if pair not in chat_ids:
+                    chat_ids[pair] = find_or_create_chat(pending.sender_id, receiver_id, db).id
+                rows.append(Message(
+                    chat_id=chat_ids[pair],
+                    sender_id=pending.sender_id,
+                    content=pending.message.content,
+                    advertisement_id=pending.message.advertisement_id
+                ))
+
+            db.add_all([row for row in rows if row is not None])
+            db.flush()
+            results = [
+                new_message_event(row, pending.message.receiver_id) if row is not None else "Receiver not found"
+                for pending, row in zip(batch, rows)
+            ]
+            db.commit()
+            return results
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _publish(self, batch: List[PendingMessage], results: List[Union[dict, str]]):
+        for pending, result in zip(batch, results):
+            if isinstance(result, str):
+                await self.connections.send(
+                    pending.connection,
+                    {"type": "error", "client_id": pending.client_id, "detail": result}
+                )
+                continue
+            await self.connections.send(
+                pending.connection,
+                {"type": "ack", "client_id": pending.client_id, "message": result["message"]}
+            )
+            await self.connections.send_to_conversation(result, pending.sender_id, pending.message.receiver_id)
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,44 @@
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.messages import new_message_event
+from app.core.config import WS_REPLAY_PAGE_SIZE
+from app.models.chat import Chat, ChatParticipant
+from app.models.message import Message
+from app.websockets.connection_manager import Connection
+
+
+async def missed_messages(db: AsyncSession, user_id: int, after_id: int, limit: int) -> List[dict]:
+    """The user's messages across all chats with an id above after_id, as new_message events in id order."""
+    rows = (await db.execute(select(Message, Chat.user_low_id, Chat.user_high_id).join(
+        Chat, Chat.id == Message.chat_id
+    ).where(
+        Message.chat_id.in_(select(ChatParticipant.chat_id).where(ChatParticipant.user_id == user_id)),
+        Message.id > after_id
+    ).order_by(Message.id).limit(limit))).all()
+
+    return [
+        new_message_event(message, user_high_id if message.sender_id == user_low_id else user_low_id)
+        for message, user_low_id, user_high_id in rows
+    ]
+
+
+async def replay_missed_messages(connection: Connection, db: AsyncSession, user_id: int, last_seen_id: int) -> int:
+    """Stream everything after last_seen_id to the connection page by page, then a replay_complete marker.
+
+    Returns the id of the last replayed message, which live delivery uses to drop duplicates.
+    """
+    last_id = last_seen_id
+    while True:
+        events = await missed_messages(db, user_id, last_id, WS_REPLAY_PAGE_SIZE)
+        for event in events:
+            if not await connection.push(connection.encode(event)):
+                return last_id
+            last_id = event["message"]["id"]
+        if len(events) < WS_REPLAY_PAGE_SIZE:
+            break
+
+    await connection.push(connection.encode({"type": "replay_complete", "last_id": last_id}))
+    return last_id
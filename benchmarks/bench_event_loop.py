@@ -0,0 +1,103 @@
+"""Show how far the event loop stalls while slow queries run, comparing the blocking
+Session the async endpoints used to call directly with the AsyncSession they use now.
+
+A heartbeat task asks for a 1 ms sleep in a loop; how late it wakes up is how long any other
+request or WebSocket on the worker would have waited.
+
+Usage: python -m benchmarks.bench_event_loop [--ads 100000] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base, async_url
+from app.models.advertisement import Advertisement
+from benchmarks.bench_search import like_search, populate
+
+TICK = 0.001
+SEARCH = "item4321"
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - started - TICK) * 1000)
+
+
+async def blocking_search(session_factory):
+    session = session_factory()
+    try:
+        like_search(session, SEARCH)
+    finally:
+        session.close()
+
+
+async def async_search(session_factory):
+    term = f"%{SEARCH}%"
+    async with session_factory() as session:
+        await session.execute(
+            select(Advertisement).where(
+                or_(Advertisement.title.ilike(term), Advertisement.description.ilike(term))
+            ).order_by(Advertisement.created_at.desc(), Advertisement.id.desc()).limit(20)
+        )
+
+
+async def measure(search, session_factory, concurrency: int):
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(search(session_factory) for _ in range(concurrency)))
+    elapsed = (time.perf_counter() - started) * 1000
+
+    stop.set()
+    await ticker
+    lags.sort()
+    return elapsed, lags[-1], lags[int(len(lags) * 0.99) - 1], statistics.median(lags)
+
+
+async def run(url: str, concurrency: int):
+    sync_sessions = sessionmaker(bind=create_engine(url))
+    async_engine = create_async_engine(async_url(url))
+    async_sessions = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    print(f"{'session':<14} {'wall ms':>10} {'max lag ms':>11} {'p99 lag ms':>11} {'median lag ms':>14}")
+    for name, search, factory in (
+            ("Session", blocking_search, sync_sessions),
+            ("AsyncSession", async_search, async_sessions),
+    ):
+        elapsed, worst, p99, median = await measure(search, factory, concurrency)
+        print(f"{name:<14} {elapsed:>10.1f} {worst:>11.1f} {p99:>11.1f} {median:>14.2f}")
+
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ads", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        populate(session, args.ads)
+        session.close()
+        engine.dispose()
+
+        asyncio.run(run(url, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
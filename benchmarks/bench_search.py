@@ -0,0 +1,107 @@
+"""Compare the LIKE scan with the FTS5 index for advertisement search.
+
+Usage: python -m benchmarks.bench_search [--ads 100000] [--runs 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.db.search import search_matches, to_match_query
+from app.enums.category import CategoryEnum
+from app.models import chat, message, rating  # noqa: F401 - register tables on Base.metadata
+from app.models.advertisement import Advertisement
+from app.models.user import User
+
+WORDS = (
+    "table chair lamp sofa bed desk phone laptop tablet camera lens bike scooter helmet "
+    "guitar piano drum speaker headphones monitor keyboard mouse printer router fridge oven "
+    "kettle toaster blender mixer vacuum heater fan mirror shelf cabinet wardrobe rug curtain "
+    "red blue green black white wooden metal vintage modern compact large small new used mint"
+).split()
+VOCABULARY = WORDS + [f"item{i}" for i in range(5000)]
+WEIGHTS = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+QUERIES = ["vintage guitar", "lamp", "mint cond", "wooden desk shelf", "item4321", "zebra"]
+
+
+def populate(session, count: int):
+    rng = random.Random(42)
+    session.add(User(username="seller", email="seller@example.com", password="x"))
+    session.flush()
+    start = datetime(2024, 1, 1)
+    categories = list(CategoryEnum)
+    rows = []
+    for i in range(count):
+        rows.append({
+            "title": " ".join(rng.choices(VOCABULARY, WEIGHTS, k=4)),
+            "description": " ".join(rng.choices(VOCABULARY, WEIGHTS, k=40)),
+            "price": rng.randint(1, 1000),
+            "category": rng.choice(categories),
+            "user_id": 1,
+            "created_at": start + timedelta(minutes=i),
+        })
+        if len(rows) == 5000:
+            session.bulk_insert_mappings(Advertisement, rows)
+            rows = []
+    session.bulk_insert_mappings(Advertisement, rows)
+    session.commit()
+
+
+def like_search(session, search: str):
+    term = f"%{search}%"
+    return session.query(Advertisement).filter(
+        or_(Advertisement.title.ilike(term), Advertisement.description.ilike(term))
+    ).order_by(Advertisement.created_at.desc(), Advertisement.id.desc()).limit(20).all()
+
+
+def fts_search(session, search: str):
+    matches = search_matches(to_match_query(search))
+    return session.query(Advertisement).join(
+        matches, matches.c.advertisement_id == Advertisement.id
+    ).order_by(matches.c.rank, Advertisement.id).limit(20).all()
+
+
+def measure(fn, session, search: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        session.expunge_all()
+        started = time.perf_counter()
+        fn(session, search)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ads", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+
+        started = time.perf_counter()
+        populate(session, args.ads)
+        print(f"Inserted {args.ads} advertisements in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'query':<20} {'LIKE ms':>10} {'FTS5 ms':>10} {'speedup':>8}")
+        for search in QUERIES:
+            like_ms = measure(like_search, session, search, args.runs)
+            fts_ms = measure(fts_search, session, search, args.runs)
+            print(f"{search:<20} {like_ms:>10.2f} {fts_ms:>10.2f} {like_ms / fts_ms:>7.1f}x")
+
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
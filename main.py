@@ -1,13 +1,37 @@
 import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from app.api import users, advertisements, ratings, categories, messages, chat
 from app.auth import auth
-from app.db.database import Base, engine
+from app.auth.revocation import revoked_tokens
+from app.core.config import MAX_UPLOAD_BYTES
+from app.core import security
+from app.core.limits import UploadSizeLimitMiddleware
+from app.db.database import Base, async_engine, engine
+from app.db.migrations import run_migrations
 from fastapi.middleware.cors import CORSMiddleware
+from app.storage import renditions
+from app.websockets.connection_manager import manager
+from app.websockets.message_writer import message_writer
 from logger_config import setup_logger
 
-app = FastAPI(title="MarketNest API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.start()
+    await revoked_tokens.start()
+    await message_writer.start()
+    yield
+    await message_writer.close()
+    await revoked_tokens.close()
+    await manager.close()
+    renditions.shutdown_pool()
+    security.shutdown_pool()
+    await async_engine.dispose()
+
+
+app = FastAPI(title="MarketNest API", lifespan=lifespan)
 
 app.include_router(auth.router, prefix="/auth", tags=['auth'])
 app.include_router(users.router, prefix="/users", tags=['users'])
@@ -17,6 +41,8 @@ app.include_router(ratings.router, prefix="/ratings", tags=["ratings"])
 app.include_router(messages.router, prefix="/messages", tags=["messages"])
 app.include_router(chat.router, prefix="/chat", tags=['websockets'])
 
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -29,6 +55,7 @@ app.add_middleware(
 )
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 logger = setup_logger()
 
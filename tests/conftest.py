@@ -1,22 +1,39 @@
+import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
+from app.auth.revocation import revoked_tokens
 from app.core.security import Hash
 from main import app
-from app.db.database import get_db, Base
+from app.db.database import Base, async_url, get_async_db, get_db
 from app.models.user import User
+from app.core.cache import InMemoryCache, ResponseCache, get_response_cache
+from app.storage.blob_store import FileSystemBlobStore, get_blob_store
+from app.websockets.message_writer import message_writer
 
 
-TEST_DB_URL = "sqlite:///:memory:"
+# A file rather than :memory: so the sync engine and the aiosqlite engine see the same database.
+TEST_DB_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='marketnest-tests-'), 'test.db')}"
 engine = create_engine(
     TEST_DB_URL,
-    connect_args={"check_same_thread": False, "isolation_level": None},
-    poolclass=StaticPool,
+    connect_args={"check_same_thread": False},
     echo=False
 )
+# Each TestClient runs its own event loop, so async connections must not outlive a test.
+async_engine = create_async_engine(async_url(TEST_DB_URL), poolclass=NullPool)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def skip_fsync(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA synchronous = OFF")
 
 
 def override_get_db():
@@ -27,12 +44,28 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+message_writer.session_factory = TestingSessionLocal
+revoked_tokens.session_factory = TestingAsyncSessionLocal
+
+
+@pytest.fixture
+def blob_store(tmp_path):
+    return FileSystemBlobStore(tmp_path / "photos")
 
 
 @pytest.fixture
-def client():
+def client(blob_store):
     Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[get_blob_store] = lambda: blob_store
+    response_cache = ResponseCache(InMemoryCache())
+    app.dependency_overrides[get_response_cache] = lambda: response_cache
 
     db = TestingSessionLocal()
     test_user = User(
@@ -48,6 +81,9 @@ def client():
         yield c
 
     Base.metadata.drop_all(bind=engine)
+    revoked_tokens.clear()
+    del app.dependency_overrides[get_blob_store]
+    del app.dependency_overrides[get_response_cache]
 
 
 @pytest.fixture
@@ -1,5 +1,8 @@
 from fastapi import status
 
+JPEG_BYTES = b'\xff\xd8\xff\xe0fake image data'
+PNG_BYTES = b'\x89PNG\r\n\x1a\n0123456789'
+
 def test_create_advertisement_success(client, auth_token):
     form_data = {
         'title': 'iPhone 13 for sale',
@@ -56,7 +59,7 @@ def test_get_advertisements_empty(client):
     response = client.get("/advertisements/all")
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == []
+    assert response.json() == {"items": [], "next_cursor": None}
 
 
 def test_get_advertisements_with_data(client, auth_token):
@@ -76,7 +79,7 @@ def test_get_advertisements_with_data(client, auth_token):
     response = client.get("/advertisements/all")
 
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert len(data) == 1
     assert data[0]["title"] == "iPhone 13 for sale"
 
@@ -263,7 +266,7 @@ def test_filter_advertisements_by_category(client, auth_token):
 
     response = client.get("/advertisements/all?category=electronics")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert len(data) == 1
     assert data[0]["category"] == "electronics"
 
@@ -328,7 +331,7 @@ def test_filter_advertisements_by_status(client, auth_token):
 
     response = client.get("/advertisements/all?status=available")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert len(data) == 1
     assert data[0]["status"] == "available"
 
@@ -379,13 +382,13 @@ def test_search_advertisements(client, auth_token):
 
     response = client.get("/advertisements/all?search=iPhone")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert len(data) == 1
     assert "iPhone" in data[0]["title"]
 
     response = client.get("/advertisements/all?search=camera")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert len(data) == 1
     assert "camera" in data[0]["description"]
 
@@ -399,7 +402,7 @@ def test_create_advertisement_with_photos(client, auth_token):
     }
 
     files = {
-        'photos': ('test.jpg', b'fake image data', 'image/jpeg')
+        'photos': ('test.jpg', JPEG_BYTES, 'image/jpeg')
     }
 
     response = client.post(
@@ -412,7 +415,11 @@ def test_create_advertisement_with_photos(client, auth_token):
     assert response.status_code == status.HTTP_200_OK
     data = response.json()
     assert len(data["photos"]) == 1
-    assert data["photos"][0].startswith("data:image/jpeg;base64,")
+    photo = data["photos"][0]
+    assert photo["content_type"] == "image/jpeg"
+    assert photo["file_size"] == len(JPEG_BYTES)
+    assert photo["order"] == 0
+    assert photo["url"].startswith(f"/advertisements/{data['id']}/photos/{photo['id']}")
 
 
 def test_sort_advertisements_by_date(client, auth_token):
@@ -446,13 +453,13 @@ def test_sort_advertisements_by_date(client, auth_token):
 
     response = client.get("/advertisements/all?sort_by=newest")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert data[0]["title"] == "Second Item"
     assert data[1]["title"] == "First Item"
 
     response = client.get("/advertisements/all?sort_by=oldest")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert data[0]["title"] == "First Item"
     assert data[1]["title"] == "Second Item"
 
@@ -581,7 +588,7 @@ def test_filter_advertisements_multiple_params(client, auth_token):
 
     response = client.get("/advertisements/all?category=electronics&search=iPhone&status=available")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert len(data) == 1
     assert data[0]["title"] == "iPhone Electronics"
     assert data[0]["category"] == "electronics"
@@ -597,7 +604,7 @@ def test_advertisement_with_maximum_photos(client, auth_token):
     }
 
     files = [
-        ('photos', (f'test{i}.jpg', b'fake image data', 'image/jpeg'))
+        ('photos', (f'test{i}.jpg', JPEG_BYTES, 'image/jpeg'))
         for i in range(5)
     ]
 
@@ -622,7 +629,7 @@ def test_advertisement_exceeds_photo_limit(client, auth_token):
     }
 
     files = [
-        ('photos', (f'test{i}.jpg', b'fake image data', 'image/jpeg'))
+        ('photos', (f'test{i}.jpg', JPEG_BYTES, 'image/jpeg'))
         for i in range(6)
     ]
 
@@ -653,10 +660,382 @@ def test_search_advertisements_case_insensitive(client, auth_token):
 
     response = client.get("/advertisements/all?search=iphone")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
+    data = response.json()["items"]
     assert len(data) == 1
 
     response = client.get("/advertisements/all?search=SMARTPHONE")
     assert response.status_code == status.HTTP_200_OK
-    data = response.json()
-    assert len(data) == 1
\ No newline at end of file
+    data = response.json()["items"]
+    assert len(data) == 1
+
+def test_paginate_advertisements_with_cursor(client, auth_token):
+    for i in range(5):
+        client.post(
+            "/advertisements/",
+            headers={"Authorization": f"Bearer {auth_token}"},
+            data={
+                'title': f'Item {i}',
+                'description': 'Paginated item',
+                'price': '10.00',
+                'category': 'electronics'
+            }
+        )
+
+    for sort_by, expected in (("newest", [5, 4, 3, 2, 1]), ("oldest", [1, 2, 3, 4, 5])):
+        seen = []
+        cursor = None
+        while True:
+            params = {"sort_by": sort_by, "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/advertisements/all", params=params)
+            assert response.status_code == status.HTTP_200_OK
+            page = response.json()
+            assert len(page["items"]) <= 2
+            seen.extend(ad["id"] for ad in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert seen == expected
+
+
+def test_paginate_advertisements_invalid_cursor(client, auth_token):
+    for i in range(2):
+        client.post(
+            "/advertisements/",
+            headers={"Authorization": f"Bearer {auth_token}"},
+            data={
+                'title': f'Item {i}',
+                'description': 'Paginated item',
+                'price': '10.00',
+                'category': 'electronics'
+            }
+        )
+
+    response = client.get("/advertisements/all?cursor=not-a-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Invalid cursor"
+
+    oldest_cursor = client.get("/advertisements/all?sort_by=oldest&limit=1").json()["next_cursor"]
+    response = client.get(f"/advertisements/all?sort_by=newest&cursor={oldest_cursor}")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_advertisement_photo(client, auth_token):
+    form_data = {
+        'title': 'Photo item',
+        'description': 'Has a photo',
+        'price': '10.00',
+        'category': 'electronics'
+    }
+    files = {
+        'photos': ('test.png', PNG_BYTES, 'image/png')
+    }
+
+    create_response = client.post(
+        "/advertisements/",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        data=form_data,
+        files=files
+    )
+    photo_url = create_response.json()["photos"][0]["url"]
+
+    response = client.get(photo_url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == PNG_BYTES
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+
+    response = client.get(photo_url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = client.get(photo_url, headers={"Range": "bytes=10-13"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == b'2345'
+    assert response.headers["content-range"] == "bytes 10-13/18"
+
+    response = client.get(photo_url, headers={"Range": "bytes=-3"})
+    assert response.content == b'789'
+
+    response = client.get(photo_url, headers={"Range": "bytes=20-"})
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+
+
+def test_get_advertisement_photo_not_found(client):
+    response = client.get("/advertisements/1/photos/999")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "Photo not found"
+
+
+def test_photo_content_type_is_sniffed(client, auth_token):
+    form_data = {'title': 'Sniffed', 'description': 'PNG sent as jpeg', 'price': '10.00', 'category': 'electronics'}
+
+    response = client.post(
+        "/advertisements/",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        data=form_data,
+        files={'photos': ('test.jpg', PNG_BYTES, 'image/jpeg')}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["photos"][0]["content_type"] == "image/png"
+
+    response = client.post(
+        "/advertisements/",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        data=form_data,
+        files={'photos': ('test.jpg', b'<html>not an image</html>', 'image/jpeg')}
+    )
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+def test_photo_size_limits(client, auth_token, monkeypatch):
+    from app.api import advertisements
+
+    monkeypatch.setattr(advertisements, "MAX_PHOTO_BYTES", 100)
+    monkeypatch.setattr(advertisements, "MAX_UPLOAD_BYTES", 150)
+    form_data = {'title': 'Limits', 'description': 'Big photos', 'price': '10.00', 'category': 'electronics'}
+    headers = {"Authorization": f"Bearer {auth_token}"}
+
+    response = client.post(
+        "/advertisements/",
+        headers=headers,
+        data=form_data,
+        files={'photos': ('big.jpg', JPEG_BYTES + b'x' * 100, 'image/jpeg')}
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    files = [('photos', (f'test{i}.jpg', JPEG_BYTES + b'x' * 60 + bytes([i]), 'image/jpeg')) for i in range(2)]
+    response = client.post("/advertisements/", headers=headers, data=form_data, files=files)
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    assert client.get("/advertisements/all").json()["items"] == []
+
+    response = client.post("/advertisements/", headers=headers, data=form_data, files=files[:1])
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_request_body_limit():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+    from app.core.limits import FORM_OVERHEAD_BYTES, UploadSizeLimitMiddleware
+
+    async def upload(request):
+        form = await request.form()
+        return PlainTextResponse(str(len(await form["file"].read())))
+
+    app = Starlette(routes=[Route("/", upload, methods=["POST"])])
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=1000)
+    client = TestClient(app)
+
+    response = client.post("/", files={'file': ('a.jpg', b'x' * 500, 'image/jpeg')})
+    assert response.text == "500"
+
+    response = client.post("/", files={'file': ('a.jpg', b'x' * (FORM_OVERHEAD_BYTES + 2000), 'image/jpeg')})
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    def chunked_body():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.jpg"\r\n\r\n'
+        for _ in range(10):
+            yield b'x' * (FORM_OVERHEAD_BYTES // 4)
+        yield b'\r\n--b--\r\n'
+
+    response = client.post(
+        "/",
+        content=chunked_body(),
+        headers={"Content-Type": "multipart/form-data; boundary=b"}
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+def test_photo_renditions_for_listing_and_detail(client, auth_token):
+    from io import BytesIO
+    from PIL import Image
+
+    image = Image.new("RGB", (2000, 1500), color=(200, 30, 30))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG")
+
+    create_response = client.post(
+        "/advertisements/",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        data={
+            'title': 'Large photo',
+            'description': 'Needs renditions',
+            'price': '10.00',
+            'category': 'electronics'
+        },
+        files={'photos': ('large.jpg', buffer.getvalue(), 'image/jpeg')}
+    )
+    ad_id = create_response.json()["id"]
+
+    listed_photo = client.get("/advertisements/all").json()["items"][0]["photos"][0]
+    detail_photo = client.get(f"/advertisements/{ad_id}").json()["photos"][0]
+    assert "size=thumb" in listed_photo["url"]
+    assert "size=medium" in detail_photo["url"]
+    assert listed_photo["original_url"] == detail_photo["original_url"]
+
+    thumbnail = client.get(listed_photo["url"])
+    assert thumbnail.headers["content-type"] == "image/webp"
+    assert Image.open(BytesIO(thumbnail.content)).size == (320, 240)
+
+    medium = client.get(detail_photo["url"])
+    assert Image.open(BytesIO(medium.content)).size == (1024, 768)
+
+    original = client.get(detail_photo["original_url"])
+    assert original.content == buffer.getvalue()
+    assert len(thumbnail.content) < len(original.content)
+
+
+def test_search_advertisements_full_text(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    ads = [
+        ('Oak table', 'Solid wooden table, a table for the dining room', 'furniture'),
+        ('Table lamp', 'Lamp with a long cable and a warm light bulb included', 'electronics'),
+        ('Gaming chair', 'Comfortable chair', 'furniture'),
+    ]
+    for title, description, category in ads:
+        client.post("/advertisements/", headers=headers, data={
+            'title': title,
+            'description': description,
+            'price': '10.00',
+            'category': category
+        })
+
+    data = client.get("/advertisements/all?search=tab").json()["items"]
+    assert {ad["title"] for ad in data} == {'Oak table', 'Table lamp'}
+    assert data[0]["title"] == 'Oak table'
+
+    data = client.get("/advertisements/all?search=table&category=furniture").json()["items"]
+    assert [ad["title"] for ad in data] == ['Oak table']
+
+    data = client.get("/advertisements/all?search=wooden table").json()["items"]
+    assert [ad["title"] for ad in data] == ['Oak table']
+
+    first_page = client.get("/advertisements/all?search=table&limit=1").json()
+    second_page = client.get(f"/advertisements/all?search=table&limit=1&cursor={first_page['next_cursor']}").json()
+    assert [ad["title"] for ad in first_page["items"] + second_page["items"]] == ['Oak table', 'Table lamp']
+    assert second_page["next_cursor"] is None
+
+
+def test_search_without_words_falls_back_to_substring_match(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for title in ('Hand-made vase', 'Plain vase'):
+        client.post("/advertisements/", headers=headers, data={
+            'title': title,
+            'description': 'Ceramic',
+            'price': '10.00',
+            'category': 'other'
+        })
+
+    assert [ad["title"] for ad in client.get("/advertisements/all?search=-").json()["items"]] == ['Hand-made vase']
+    assert client.get("/advertisements/all?search=!!!").json()["items"] == []
+
+
+def test_search_index_follows_updates_and_deletes(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    ad_id = client.post("/advertisements/", headers=headers, data={
+        'title': 'Bicycle',
+        'description': 'Red city bike',
+        'price': '100.00',
+        'category': 'other'
+    }).json()["id"]
+
+    client.put(f"/advertisements/{ad_id}", headers=headers, data={
+        'title': 'Scooter',
+        'description': 'Electric scooter',
+        'price': '100.00',
+        'category': 'other'
+    })
+
+    assert client.get("/advertisements/all?search=bicycle").json()["items"] == []
+    assert len(client.get("/advertisements/all?search=scooter").json()["items"]) == 1
+
+    client.delete(f"/advertisements/{ad_id}", headers=headers)
+    assert client.get("/advertisements/all?search=scooter").json()["items"] == []
+
+
+def test_sort_advertisements_by_seller_rating(client, auth_tokens):
+    seller_token, buyer_token = auth_tokens
+
+    def create(token, title):
+        return client.post(
+            "/advertisements/",
+            headers={"Authorization": f"Bearer {token}"},
+            data={'title': title, 'description': 'Rated', 'price': '10.00', 'category': 'other'}
+        ).json()["id"]
+
+    sold_id = create(seller_token, 'Sold by rated seller')
+    create(seller_token, 'Second from rated seller')
+    create(buyer_token, 'From unrated seller')
+
+    client.patch(f"/advertisements/{sold_id}/buy", headers={"Authorization": f"Bearer {buyer_token}"})
+    client.post(
+        "/ratings/",
+        headers={"Authorization": f"Bearer {buyer_token}"},
+        json={"reviewed_user_id": 1, "advertisement_id": sold_id, "rating": 5, "comment": "Great"}
+    )
+
+    def titles(rating_sort):
+        seen, cursor = [], None
+        while True:
+            params = {"rating_sort": rating_sort, "limit": 1}
+            if cursor:
+                params["cursor"] = cursor
+            page = client.get("/advertisements/all", params=params).json()
+            seen.extend(ad["title"] for ad in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    assert titles("rating_high") == ['Second from rated seller', 'Sold by rated seller', 'From unrated seller']
+    assert titles("rating_low") == ['From unrated seller', 'Second from rated seller', 'Sold by rated seller']
+
+
+def test_summary_view(client, auth_tokens):
+    seller_token, buyer_token = auth_tokens
+    headers = {"Authorization": f"Bearer {seller_token}"}
+    form_data = {'title': 'Camera', 'description': 'Mirrorless body', 'price': '450.00', 'category': 'electronics'}
+
+    with_photos = client.post(
+        "/advertisements/",
+        headers=headers,
+        data=form_data,
+        files=[
+            ('photos', ('a.jpg', JPEG_BYTES, 'image/jpeg')),
+            ('photos', ('b.png', PNG_BYTES, 'image/png'))
+        ]
+    ).json()
+    client.post("/advertisements/", headers=headers, data={**form_data, 'title': 'Lens'})
+
+    client.patch(f"/advertisements/{with_photos['id']}/buy", headers={"Authorization": f"Bearer {buyer_token}"})
+    client.post(
+        "/ratings/",
+        headers={"Authorization": f"Bearer {buyer_token}"},
+        json={"reviewed_user_id": 1, "advertisement_id": with_photos["id"], "rating": 4, "comment": "Good"}
+    )
+
+    page = client.get("/advertisements/all?view=summary&limit=1").json()
+    assert page["items"][0]["title"] == "Lens"
+    assert page["items"][0]["photo"] is None
+
+    page = client.get(f"/advertisements/all?view=summary&cursor={page['next_cursor']}").json()
+    item = page["items"][0]
+    assert set(item) == {"id", "title", "price", "status", "category", "photo", "seller"}
+    assert item["status"] == "sold"
+    assert item["seller"] == {"id": 1, "username": "testuser", "average_rating": 4.0, "total_reviews": 1}
+    assert item["photo"]["url"] == with_photos["photos"][0]["url"].replace("size=medium", "size=thumb")
+    assert page["next_cursor"] is None
+
+    detail = client.get(f"/advertisements/{with_photos['id']}?view=summary").json()
+    assert detail == item
+
+    assert "description" in client.get(f"/advertisements/{with_photos['id']}").json()
+    assert client.get("/advertisements/999?view=summary").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/advertisements/all?view=compact").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    by_rating = client.get("/advertisements/all?view=summary&rating_sort=rating_high").json()
+    assert [ad["title"] for ad in by_rating["items"]] == ["Lens", "Camera"]
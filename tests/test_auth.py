@@ -1,4 +1,29 @@
-from fastapi import status
+import asyncio
+import time
+from datetime import datetime
+
+import jwt
+import pytest
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from sqlalchemy import event
+
+from app.auth.oauth2 import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    SECRET_KEY,
+    Principal,
+    create_access_token,
+    get_current_principal,
+    get_current_user,
+)
+from app.auth.revocation import REVOCATION_TOPIC, revoked_tokens
+from app.core import security
+from app.core.config import BCRYPT_ROUNDS
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+from tests.conftest import TestingSessionLocal, async_engine, engine
+
 
 def test_login_success(client):
     response = client.post("/auth/login", data={
@@ -78,3 +103,183 @@ def test_logout_invalid_token(client):
         "Authorization": "Bearer invalid-token"
     })
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def resolve_user(token):
+    db = TestingSessionLocal()
+    try:
+        return get_current_user(token, db).id
+    finally:
+        db.close()
+
+
+def test_token_without_uid_claim_resolves_through_user_lookup(client):
+    legacy = create_access_token(data={'sub': 'testuser'})
+
+    db = TestingSessionLocal()
+    try:
+        assert get_current_principal(legacy, db) == Principal(id=1, username="testuser")
+    finally:
+        db.close()
+
+
+def test_renamed_user_no_longer_resolves(client, auth_token):
+    resolve_user(auth_token)
+
+    db = TestingSessionLocal()
+    db.query(User).filter(User.username == "testuser").one().username = "renamed"
+    db.commit()
+    db.close()
+
+    with pytest.raises(HTTPException) as rejected:
+        resolve_user(auth_token)
+    assert rejected.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_login_rehashes_password_stored_with_other_rounds(client):
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.username == "testuser").one()
+    user.password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("testpassword")
+    db.commit()
+    db.close()
+
+    response = client.post("/auth/login", data={"username": "testuser", "password": "testpassword"})
+    assert response.status_code == status.HTTP_200_OK
+
+    db = TestingSessionLocal()
+    stored = db.query(User.password).filter(User.username == "testuser").scalar()
+    db.close()
+    assert stored.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    assert client.post("/auth/login", data={"username": "testuser", "password": "testpassword"}).status_code == 200
+
+
+def test_login_is_shed_when_hashing_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_MAX_PENDING", 0)
+
+    response = client.post("/auth/login", data={"username": "testuser", "password": "testpassword"})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_logout_revokes_only_that_token(client):
+    def login():
+        return client.post("/auth/login", data={"username": "testuser", "password": "testpassword"}).json()["access_token"]
+
+    revoked, other = login(), login()
+    assert client.post("/auth/logout", headers={"Authorization": f"Bearer {revoked}"}).status_code == 200
+
+    assert client.get("/messages/conversations", headers={"Authorization": f"Bearer {revoked}"}).status_code == 401
+    assert client.get("/messages/conversations", headers={"Authorization": f"Bearer {other}"}).status_code == 200
+
+
+def test_revocations_survive_restart_and_arrive_from_other_workers(client):
+    token = client.post("/auth/login", data={"username": "testuser", "password": "testpassword"}).json()["access_token"]
+    client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"})
+
+    revoked_tokens.clear()
+    assert client.get("/messages/conversations", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    asyncio.run(revoked_tokens.sync())
+    assert client.get("/messages/conversations", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+    asyncio.run(revoked_tokens.connections.deliver(REVOCATION_TOPIC, f"remote {time.time() + 60}".encode()))
+    assert revoked_tokens.is_revoked("remote")
+
+
+def test_revocation_whose_publish_was_lost_is_picked_up_by_sync(client):
+    token = client.post("/auth/login", data={"username": "testuser", "password": "testpassword"}).json()["access_token"]
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    asyncio.run(revoked_tokens.sync())
+
+    # Another worker logged the token out while the hub was unreachable: the row exists, the publish never arrived.
+    db = TestingSessionLocal()
+    db.add(RevokedToken(jti=claims["jti"], expires_at=datetime.utcfromtimestamp(claims["exp"])))
+    db.commit()
+    db.close()
+    assert client.get("/messages/conversations", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    asyncio.run(revoked_tokens.sync())
+    assert client.get("/messages/conversations", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def login_tokens(client):
+    return client.post("/auth/login", data={"username": "testuser", "password": "testpassword"}).json()
+
+
+def test_refresh_rotates_and_detects_reuse(client):
+    first = login_tokens(client)
+
+    rotated = client.post("/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert rotated.status_code == status.HTTP_200_OK
+    second = rotated.json()
+    assert second["refresh_token"] != first["refresh_token"]
+    assert client.get("/messages/conversations",
+                      headers={"Authorization": f"Bearer {second['access_token']}"}).status_code == 200
+
+    reused = client.post("/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert reused.status_code == status.HTTP_401_UNAUTHORIZED
+    assert reused.json()["detail"] == "Refresh token reuse detected"
+    assert client.post("/auth/refresh", json={"refresh_token": second["refresh_token"]}).status_code == 401
+
+
+def test_logout_revokes_refresh_token(client):
+    tokens = login_tokens(client)
+    client.post("/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": "unknown"}).status_code == 401
+
+
+def test_access_token_authorizes_without_user_lookup(client):
+    tokens = login_tokens(client)
+    claims = jwt.decode(tokens["access_token"], SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["uid"] == tokens["user"]["id"]
+    assert claims["exp"] - time.time() == pytest.approx(tokens["expires_in"], abs=5)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", capture)
+    try:
+        response = client.get("/messages/conversations", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    finally:
+        for target in (engine, async_engine.sync_engine):
+            event.remove(target, "before_cursor_execute", capture)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert statements
+    assert not [statement for statement in statements if "FROM users" in statement]
+
+
+def test_register_login_and_logout_keep_blocking_queries_off_the_event_loop(client):
+    blocking = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        blocking.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        client.post("/users/register", json={"username": "async", "email": "async@example.com", "password": "password123"})
+        tokens = client.post("/auth/login", data={"username": "async", "password": "password123"}).json()
+        response = client.post("/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert blocking == []
+
+
+def test_access_token_lifetime_does_not_depend_on_host_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        token = create_access_token(data={'sub': 'testuser'})
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["exp"] - time.time() == pytest.approx(ACCESS_TOKEN_EXPIRE_MINUTES * 60, abs=5)
@@ -0,0 +1,410 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import msgpack
+import pytest
+from websockets.sync.client import connect
+
+from app.websockets.backplane import HubBackplane, InMemoryBackplane
+from app.websockets.hub import Hub
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nothing listening on port {port}")
+
+
+def test_websocket_receives_message_sent_over_rest(client, auth_tokens):
+    seller_token, _ = auth_tokens
+
+    with client.websocket_connect("/chat/ws/2") as websocket:
+        client.post("/messages/", headers={"Authorization": f"Bearer {seller_token}"},
+                    json={"receiver_id": 2, "content": "Still available", "advertisement_id": None})
+        frame = websocket.receive_json()
+
+    assert frame["type"] == "new_message"
+    assert frame["message"]["content"] == "Still available"
+
+
+def test_in_memory_backplane_only_delivers_subscribed_topics():
+    delivered = []
+
+    async def deliver(topic, payload):
+        delivered.append((topic, payload))
+
+    async def scenario():
+        backplane = InMemoryBackplane()
+        await backplane.start(deliver)
+        await backplane.subscribe("user:1")
+        await backplane.publish("user:1", b"hello")
+        await backplane.publish("user:2", b"nobody home")
+        await backplane.unsubscribe("user:1")
+        await backplane.publish("user:1", b"gone")
+
+    asyncio.run(scenario())
+    assert delivered == [("user:1", b"hello")]
+
+
+def test_hub_routes_to_subscribed_backplane():
+    async def scenario():
+        server = await asyncio.start_server(Hub().handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        received = asyncio.Queue()
+
+        async def deliver(topic, payload):
+            await received.put((topic, payload))
+
+        async def ignore(topic, payload):
+            raise AssertionError("worker b is not subscribed")
+
+        worker_a, worker_b = HubBackplane("127.0.0.1", port), HubBackplane("127.0.0.1", port)
+        await worker_a.start(deliver)
+        await worker_b.start(ignore)
+        await worker_a.subscribe("user:7")
+        await asyncio.sleep(0.05)
+
+        await worker_b.publish("user:7", b"\x00binary\xff")
+        await worker_b.publish("user:8", b"dropped")
+        result = await asyncio.wait_for(received.get(), timeout=2)
+
+        await worker_a.close()
+        await worker_b.close()
+        server.close()
+        await server.wait_closed()
+        return result
+
+    assert asyncio.run(scenario()) == ("user:7", b"\x00binary\xff")
+
+
+def test_hub_backplane_keeps_reading_after_a_failed_delivery():
+    async def scenario():
+        server = await asyncio.start_server(Hub().handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        received = asyncio.Queue()
+
+        async def deliver(topic, payload):
+            if payload == b"malformed":
+                raise ValueError("cannot parse payload")
+            await received.put(payload)
+
+        worker = HubBackplane("127.0.0.1", port)
+        await worker.start(deliver)
+        await worker.subscribe("auth:revoked")
+        await asyncio.sleep(0.05)
+
+        await worker.publish("auth:revoked", b"malformed")
+        await worker.publish("auth:revoked", b"valid")
+        result = await asyncio.wait_for(received.get(), timeout=2)
+
+        await worker.close()
+        server.close()
+        await server.wait_closed()
+        return result
+
+    assert asyncio.run(scenario()) == b"valid"
+
+
+class StubSubscriber:
+    def __init__(self, stalled: bool = False):
+        self.stalled = stalled
+        self.frames = []
+        self.closed = False
+
+    def write(self, frame: bytes):
+        self.frames.append(frame)
+
+    async def drain(self):
+        if self.stalled:
+            await asyncio.Event().wait()
+
+    def close(self):
+        self.closed = True
+
+
+def test_hub_drops_stalled_subscriber_without_blocking_the_others():
+    async def scenario():
+        hub = Hub(drain_timeout=0.05)
+        stalled, healthy = StubSubscriber(stalled=True), StubSubscriber()
+        for topic in ("user:1", "user:2"):
+            hub.subscribers[topic].update((stalled, healthy))
+
+        await asyncio.wait_for(hub.publish("user:1", b"first"), timeout=1)
+        await asyncio.wait_for(hub.publish("user:1", b"second"), timeout=1)
+        return hub, stalled, healthy
+
+    hub, stalled, healthy = asyncio.run(scenario())
+    assert len(healthy.frames) == 2
+    assert len(stalled.frames) == 1 and stalled.closed
+    assert all(stalled not in subscribers for subscribers in hub.subscribers.values())
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    hub_port, api_ports = free_port(), [free_port(), free_port()]
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "BACKPLANE_URL": f"tcp://127.0.0.1:{hub_port}",
+        "PHOTO_STORAGE_DIR": str(tmp_path / "photos"),
+    }
+    processes = [subprocess.Popen(
+        [sys.executable, "-m", "app.websockets.hub", "--port", str(hub_port)],
+        cwd=tmp_path, env=env
+    )]
+    try:
+        wait_for_port(hub_port)
+        for port in api_ports:
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=tmp_path, env=env, stderr=subprocess.DEVNULL
+            ))
+            wait_for_port(port)
+        yield api_ports
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def test_message_reaches_socket_on_another_worker(cluster):
+    worker_a, worker_b = (f"127.0.0.1:{port}" for port in cluster)
+
+    with httpx.Client(base_url=f"http://{worker_a}") as http:
+        for name in ("seller", "buyer"):
+            http.post("/users/register", json={"username": name, "email": f"{name}@example.com", "password": "password123"})
+        token = http.post("/auth/login", data={"username": "seller", "password": "password123"}).json()["access_token"]
+
+        with connect(f"ws://{worker_b}/chat/ws/2") as websocket:
+            time.sleep(0.2)
+            response = http.post("/messages/", headers={"Authorization": f"Bearer {token}"},
+                                 json={"receiver_id": 2, "content": "Cross-worker hello", "advertisement_id": None})
+            assert response.status_code == 200
+            frame = websocket.recv(timeout=5)
+
+    assert '"Cross-worker hello"' in frame
+
+
+class BlockingWebSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed_with = None
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text):
+        await self.unblocked.wait()
+        self.sent.append(text)
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+
+
+def test_every_tab_of_a_user_receives_messages(client, auth_tokens):
+    seller_token, _ = auth_tokens
+
+    with client.websocket_connect("/chat/ws/2") as first_tab, client.websocket_connect("/chat/ws/2") as second_tab:
+        client.post("/messages/", headers={"Authorization": f"Bearer {seller_token}"},
+                    json={"receiver_id": 2, "content": "Both tabs", "advertisement_id": None})
+        assert first_tab.receive_json()["message"]["content"] == "Both tabs"
+        assert second_tab.receive_json()["message"]["content"] == "Both tabs"
+
+
+def test_slow_consumer_is_dropped_without_delaying_others():
+    from app.websockets.connection_manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager(InMemoryBackplane(), queue_size=2)
+        await manager.start()
+        fast, slow = BlockingWebSocket(), BlockingWebSocket(blocked=True)
+        await manager.connect(fast, 1)
+        slow_connection = await manager.connect(slow, 1)
+
+        for i in range(5):
+            await manager.send_personal_message({"n": i}, 1)
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.05)
+
+        return fast, slow, slow_connection, manager
+
+    fast, slow, slow_connection, manager = asyncio.run(scenario())
+    assert fast.sent == [f'{{"n": {i}}}' for i in range(5)]
+    assert slow.sent == []
+    assert slow.closed_with == 1008
+    assert slow_connection not in manager.active_connections[1]
+
+
+def test_idle_socket_is_closed_and_pong_keeps_it_alive(client, monkeypatch):
+    from app.websockets.connection_manager import manager
+
+    monkeypatch.setattr(manager, "idle_timeout", 0.3)
+
+    with client.websocket_connect("/chat/ws/2") as websocket:
+        for _ in range(4):
+            time.sleep(0.15)
+            websocket.send_json({"type": "pong"})
+        assert 2 in manager.active_connections
+
+        message = websocket.receive()
+        assert message == {"type": "websocket.close", "code": 1001, "reason": "Idle timeout"}
+
+    assert 2 not in manager.active_connections
+    assert manager.connection_count == 0
+
+
+def test_listen_only_socket_stays_open_without_idle_timeout(client, monkeypatch):
+    from app.websockets.connection_manager import manager
+
+    monkeypatch.setattr(manager, "idle_timeout", 0)
+
+    with client.websocket_connect("/chat/ws/2"):
+        time.sleep(0.5)
+        assert 2 in manager.active_connections
+
+    assert manager.connection_count == 0
+
+
+def test_connection_cap_rejects_new_sockets(client, monkeypatch):
+    from starlette.websockets import WebSocketDisconnect
+    from app.websockets.connection_manager import manager
+
+    monkeypatch.setattr(manager, "max_connections", 1)
+
+    with client.websocket_connect("/chat/ws/2"):
+        with pytest.raises(WebSocketDisconnect) as rejected:
+            with client.websocket_connect("/chat/ws/3"):
+                pass
+        assert rejected.value.code == 1013
+
+    with client.websocket_connect("/chat/ws/3"):
+        assert manager.connection_count == 1
+
+
+def test_sweep_pings_connections_and_evicts_full_queues():
+    from app.websockets.connection_manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager(InMemoryBackplane(), queue_size=1, idle_timeout=60)
+        healthy, stuck = BlockingWebSocket(), BlockingWebSocket(blocked=True)
+        await manager.connect(healthy, 1)
+        await manager.connect(stuck, 2)
+
+        for _ in range(3):
+            await manager.sweep()
+            await asyncio.sleep(0.01)
+        return healthy, stuck, manager
+
+    healthy, stuck, manager = asyncio.run(scenario())
+    assert healthy.sent == ['{"type": "ping"}'] * 3
+    assert stuck.closed_with == 1008
+    assert list(manager.active_connections) == [1]
+
+
+def test_sweep_without_idle_timeout_only_evicts_full_queues():
+    from app.websockets.connection_manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager(InMemoryBackplane(), queue_size=1, idle_timeout=0)
+        healthy, stuck = BlockingWebSocket(), BlockingWebSocket(blocked=True)
+        await manager.connect(healthy, 1)
+        stuck_connection = await manager.connect(stuck, 2)
+        for payload in (b'{"n": 1}', b'{"n": 2}'):
+            stuck_connection.offer(payload)
+            await asyncio.sleep(0.01)
+
+        for _ in range(3):
+            await manager.sweep()
+            await asyncio.sleep(0.01)
+        return healthy, stuck, manager
+
+    healthy, stuck, manager = asyncio.run(scenario())
+    assert healthy.sent == []
+    assert stuck.closed_with == 1008
+    assert list(manager.active_connections) == [1]
+
+
+def test_lagging_batched_client_gets_backlog_in_one_frame():
+    from app.websockets.connection_manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager(InMemoryBackplane())
+        await manager.start()
+        websocket = BlockingWebSocket(blocked=True)
+        await manager.connect(websocket, 1, batch=True)
+
+        for i in range(4):
+            await manager.send_personal_message({"n": i}, 1)
+            await asyncio.sleep(0)
+        websocket.unblocked.set()
+        await asyncio.sleep(0.05)
+        return websocket
+
+    websocket = asyncio.run(scenario())
+    assert websocket.sent[0] == '{"n": 0}'
+    assert json.loads(websocket.sent[1]) == {"type": "batch", "events": [{"n": 1}, {"n": 2}, {"n": 3}]}
+
+
+def test_event_is_encoded_once_per_codec():
+    from app.websockets.codec import JsonCodec
+    from app.websockets.connection_manager import ConnectionManager
+
+    class CountingCodec(JsonCodec):
+        name = "counting"
+        encoded = 0
+
+        def encode(self, event):
+            CountingCodec.encoded += 1
+            return super().encode(event)
+
+    async def scenario():
+        manager = ConnectionManager(InMemoryBackplane())
+        await manager.start()
+        sockets = [BlockingWebSocket() for _ in range(4)]
+        for websocket in sockets[:3]:
+            await manager.connect(websocket, 1, codec=CountingCodec())
+        await manager.connect(sockets[3], 1)
+
+        await manager.send_personal_message({"type": "new_message", "message": {"id": 1}}, 1)
+        await asyncio.sleep(0.05)
+        return sockets
+
+    sockets = asyncio.run(scenario())
+    assert CountingCodec.encoded == 1
+    assert all(websocket.sent == ['{"type": "new_message", "message": {"id": 1}}'] for websocket in sockets)
+
+
+def test_msgpack_subprotocol(client, auth_tokens):
+    seller_token, _ = auth_tokens
+
+    with client.websocket_connect(f"/chat/ws/1?token={seller_token}", subprotocols=["msgpack", "json"]) as websocket:
+        assert websocket.accepted_subprotocol == "msgpack"
+        websocket.send_bytes(msgpack.packb({"type": "new_message", "client_id": "m1", "receiver_id": 2, "content": "Hi"}))
+        frames = [msgpack.unpackb(websocket.receive_bytes()) for _ in range(2)]
+
+    assert {frame["type"] for frame in frames} == {"ack", "new_message"}
+    assert all(frame["message"]["content"] == "Hi" for frame in frames)
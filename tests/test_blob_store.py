@@ -0,0 +1,94 @@
+import hashlib
+import os
+import time
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app.db.database import Base
+from app.db.migrations import run_migrations
+from app.models.advertisement import Advertisement, AdvertisementPhoto
+from app.storage.blob_store import BlobNotFound
+from app.storage.maintenance import prune_orphaned_blobs
+from tests.conftest import TestingSessionLocal
+
+
+def test_put_shards_by_hash_and_deduplicates(blob_store):
+    key = blob_store.put(b"image bytes")
+
+    assert key == hashlib.sha256(b"image bytes").hexdigest()
+    assert blob_store.path(key) == blob_store.root / key[:2] / key[2:4] / key
+    assert blob_store.put(b"image bytes") == key
+    assert list(blob_store.keys()) == [key]
+    assert blob_store.size(key) == len(b"image bytes")
+    with blob_store.open(key) as blob:
+        assert blob.read() == b"image bytes"
+
+
+def test_missing_blob_raises(blob_store):
+    with pytest.raises(BlobNotFound):
+        blob_store.open("0" * 64)
+    with pytest.raises(BlobNotFound):
+        blob_store.open("../../etc/passwd")
+    assert not blob_store.exists("0" * 64)
+
+
+def test_prune_orphaned_blobs_keeps_referenced(client, blob_store):
+    referenced = blob_store.put(b"referenced")
+    orphan = blob_store.put(b"orphan")
+    fresh_orphan = blob_store.put(b"fresh orphan")
+
+    stale = time.time() - 7200
+    os.utime(blob_store.path(referenced), (stale, stale))
+    os.utime(blob_store.path(orphan), (stale, stale))
+
+    db = TestingSessionLocal()
+    advertisement = Advertisement(title="t", description="d", price=1, category="other", user_id=1)
+    db.add(advertisement)
+    db.flush()
+    db.add(AdvertisementPhoto(
+        advertisement_id=advertisement.id,
+        content_hash=referenced,
+        filename="a.jpg",
+        content_type="image/jpeg",
+        file_size=10
+    ))
+    db.commit()
+
+    assert prune_orphaned_blobs(db, blob_store) == 1
+    db.close()
+
+    assert blob_store.exists(referenced)
+    assert not blob_store.exists(orphan)
+    assert blob_store.exists(fresh_orphan)
+
+
+def test_migrate_legacy_photo_blobs(blob_store):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE advertisement_photos"))
+        connection.execute(text(
+            "CREATE TABLE advertisement_photos ("
+            "id INTEGER PRIMARY KEY, advertisement_id INTEGER NOT NULL, photo_data BLOB NOT NULL, "
+            "filename VARCHAR(255) NOT NULL, content_type VARCHAR(50) NOT NULL, file_size INTEGER NOT NULL, "
+            "\"order\" INTEGER, created_at DATETIME)"
+        ))
+        connection.execute(text(
+            "INSERT INTO advertisement_photos (id, advertisement_id, photo_data, filename, content_type, file_size) "
+            "VALUES (1, 1, :data, 'a.jpg', 'image/jpeg', 6)"
+        ), {"data": b"legacy"})
+
+    run_migrations(engine, blob_store)
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("advertisement_photos")}
+    assert "photo_data" not in columns
+    assert "ix_advertisement_photos_content_hash" in {index["name"] for index in inspector.get_indexes("advertisement_photos")}
+
+    with engine.connect() as connection:
+        content_hash = connection.execute(text("SELECT content_hash FROM advertisement_photos WHERE id = 1")).scalar()
+    assert content_hash == hashlib.sha256(b"legacy").hexdigest()
+    with blob_store.open(content_hash) as blob:
+        assert blob.read() == b"legacy"
@@ -0,0 +1,85 @@
+from fastapi import status
+
+from app.core.cache import InMemoryCache, ResponseCache
+
+
+def test_in_memory_cache_evicts_least_recently_used():
+    backend = InMemoryCache(max_entries=2)
+    backend.set("a", b"1", ttl=60)
+    backend.set("b", b"2", ttl=60)
+    backend.get_many(["a"])
+    backend.set("c", b"3", ttl=60)
+
+    assert backend.get_many(["a", "b", "c"]) == [b"1", None, b"3"]
+
+
+def test_in_memory_cache_expires_entries():
+    backend = InMemoryCache()
+    backend.set("a", b"1", ttl=-1)
+
+    assert backend.get_many(["a"]) == [None]
+
+
+def test_response_cache_key_normalizes_params_and_tracks_tags():
+    cache = ResponseCache(InMemoryCache())
+
+    key = cache.key("listing", {"category": "electronics", "search": None, "limit": 20}, ["advertisements"])
+    assert key == cache.key("listing", {"limit": 20, "category": "electronics"}, ["advertisements"])
+
+    cache.set(key, b"page")
+    assert cache.get(key) == b"page"
+
+    cache.invalidate("ratings")
+    assert cache.key("listing", {"limit": 20, "category": "electronics"}, ["advertisements"]) == key
+
+    cache.invalidate("advertisements")
+    assert cache.key("listing", {"limit": 20, "category": "electronics"}, ["advertisements"]) != key
+
+
+def test_listing_is_cached_and_invalidated_by_writes(client, auth_tokens):
+    seller_token, buyer_token = auth_tokens
+    headers = {"Authorization": f"Bearer {seller_token}"}
+
+    assert client.get("/advertisements/all").headers["X-Cache"] == "MISS"
+    response = client.get("/advertisements/all")
+    assert response.headers["X-Cache"] == "HIT"
+    assert response.json() == {"items": [], "next_cursor": None}
+
+    ad_id = client.post("/advertisements/", headers=headers, data={
+        'title': 'Cached item',
+        'description': 'Invalidates listings',
+        'price': '10.00',
+        'category': 'electronics'
+    }).json()["id"]
+
+    response = client.get("/advertisements/all")
+    assert response.headers["X-Cache"] == "MISS"
+    assert [ad["id"] for ad in response.json()["items"]] == [ad_id]
+
+    client.patch(f"/advertisements/{ad_id}/status", headers=headers, json={"new_status": "reserved"})
+    assert client.get("/advertisements/all").json()["items"][0]["status"] == "reserved"
+
+    client.patch(f"/advertisements/{ad_id}/status", headers=headers, json={"new_status": "available"})
+    client.patch(f"/advertisements/{ad_id}/buy", headers={"Authorization": f"Bearer {buyer_token}"})
+    assert client.get("/advertisements/all").json()["items"][0]["status"] == "sold"
+
+    assert client.get("/advertisements/all?rating_sort=rating_high").headers["X-Cache"] == "MISS"
+    assert client.get("/advertisements/all?rating_sort=rating_high").headers["X-Cache"] == "HIT"
+    assert client.get("/advertisements/all?view=summary").headers["X-Cache"] == "MISS"
+    assert client.get("/advertisements/all?view=summary").headers["X-Cache"] == "HIT"
+    response = client.post("/ratings/", headers={"Authorization": f"Bearer {buyer_token}"}, json={
+        "reviewed_user_id": 1,
+        "advertisement_id": ad_id,
+        "rating": 5,
+        "comment": "Great"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    assert client.get("/advertisements/all?rating_sort=rating_high").headers["X-Cache"] == "MISS"
+    response = client.get("/advertisements/all?view=summary")
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json()["items"][0]["seller"]["average_rating"] == 5.0
+    assert response.json()["items"][0]["seller"]["total_reviews"] == 1
+    assert client.get("/advertisements/all").headers["X-Cache"] == "HIT"
+
+    client.delete(f"/advertisements/{ad_id}", headers=headers)
+    assert client.get("/advertisements/all").json()["items"] == []
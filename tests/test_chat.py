@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from starlette.websockets import WebSocketDisconnect
+
+from app.schemas.message import MessageCreate
+from app.websockets.connection_manager import Connection
+from app.websockets.message_writer import MessageWriter, PendingMessage, message_writer
+from tests.conftest import TEST_DB_URL, engine
+
+
+def test_socket_messages_are_acked_persisted_and_delivered(client, auth_tokens):
+    seller_token, buyer_token = auth_tokens
+
+    with client.websocket_connect(f"/chat/ws/1?token={seller_token}") as seller, \
+            client.websocket_connect(f"/chat/ws/2?token={buyer_token}") as buyer:
+        for i in range(3):
+            seller.send_json({"type": "new_message", "client_id": f"c{i}", "receiver_id": 2, "content": f"Offer {i}"})
+
+        frames = [seller.receive_json() for _ in range(6)]
+        acks = [frame for frame in frames if frame["type"] == "ack"]
+        assert [ack["client_id"] for ack in acks] == ["c0", "c1", "c2"]
+        assert [frame["message"]["id"] for frame in frames if frame["type"] == "new_message"] == \
+               [ack["message"]["id"] for ack in acks]
+
+        delivered = [buyer.receive_json()["message"]["content"] for _ in range(3)]
+        assert delivered == ["Offer 0", "Offer 1", "Offer 2"]
+
+    history = client.get("/messages/conversation/1", headers={"Authorization": f"Bearer {buyer_token}"}).json()
+    assert [message["content"] for message in history] == ["Offer 0", "Offer 1", "Offer 2"]
+
+
+def test_socket_rejects_invalid_and_unauthenticated_messages(client, auth_tokens):
+    seller_token, _ = auth_tokens
+
+    with client.websocket_connect(f"/chat/ws/1?token={seller_token}") as websocket:
+        websocket.send_json({"type": "new_message", "client_id": "empty", "receiver_id": 2, "content": ""})
+        error = websocket.receive_json()
+        assert error["type"] == "error" and error["client_id"] == "empty"
+
+        websocket.send_json({"type": "new_message", "client_id": "nobody", "receiver_id": 99, "content": "Hi"})
+        assert websocket.receive_json() == {"type": "error", "client_id": "nobody", "detail": "Receiver not found"}
+
+    with client.websocket_connect("/chat/ws/1") as anonymous:
+        anonymous.send_json({"type": "new_message", "client_id": "anon", "receiver_id": 2, "content": "Hi"})
+        assert anonymous.receive_json()["type"] == "error"
+
+    with pytest.raises(WebSocketDisconnect) as rejected:
+        with client.websocket_connect(f"/chat/ws/2?token={seller_token}"):
+            pass
+    assert rejected.value.code == status.WS_1008_POLICY_VIOLATION
+
+
+def test_batch_across_chats_commits_once(client, auth_tokens):
+    client.post("/users/register", json={"username": "third", "email": "third@example.com", "password": "password123"})
+    pairs = [(1, 2), (2, 1), (1, 3), (3, 2), (1, 2)] * 10
+    batch = [
+        PendingMessage(sender, MessageCreate(receiver_id=receiver, content=f"{sender}->{receiver}"), connection=None)
+        for sender, receiver in pairs
+    ]
+
+    # Trace what sqlite3 actually runs: pysqlite's implicit BEGIN and any SAVEPOINT/RELEASE never reach
+    # SQLAlchemy's commit events, yet each RELEASE outside a transaction is a commit of its own.
+    trace = []
+
+    def start_trace(dbapi_connection, connection_record, connection_proxy):
+        dbapi_connection.set_trace_callback(trace.append)
+
+    def stop_trace(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(None)
+
+    event.listen(engine, "checkout", start_trace)
+    event.listen(engine, "checkin", stop_trace)
+    try:
+        results = message_writer.write_batch(batch)
+    finally:
+        event.remove(engine, "checkout", start_trace)
+        event.remove(engine, "checkin", stop_trace)
+
+    transaction_control = [
+        statement.split()[0].upper() for statement in trace
+        if statement.split()[0].upper() in ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+    ]
+    assert transaction_control == ["BEGIN", "COMMIT"]
+    assert len({result["message"]["id"] for result in results}) == len(pairs)
+    chats = {frozenset((r["message"]["sender_id"], r["message"]["receiver_id"])): r["message"]["chat_id"] for r in results}
+    assert len(chats) == 3
+    assert len(set(chats.values())) == 3
+
+
+def test_failed_batch_only_rejects_the_bad_message(client, auth_tokens):
+    strict_engine = create_engine(TEST_DB_URL)
+    event.listen(strict_engine, "connect", lambda dbapi_connection, _: dbapi_connection.execute("PRAGMA foreign_keys = ON"))
+    writer = MessageWriter(session_factory=sessionmaker(bind=strict_engine))
+    batch = [
+        PendingMessage(1, MessageCreate(receiver_id=2, content="Fine"), connection=None),
+        PendingMessage(1, MessageCreate(receiver_id=2, content="Bad ad", advertisement_id=999), connection=None),
+        PendingMessage(2, MessageCreate(receiver_id=1, content="Also fine"), connection=None),
+    ]
+
+    try:
+        results = writer.write(batch)
+    finally:
+        strict_engine.dispose()
+
+    assert results[1] == "Message could not be saved"
+    assert [results[0]["message"]["content"], results[2]["message"]["content"]] == ["Fine", "Also fine"]
+    history = client.get("/messages/conversation/2", headers={"Authorization": f"Bearer {auth_tokens[0]}"}).json()
+    assert [message["content"] for message in history] == ["Fine", "Also fine"]
+
+
+def test_reconnect_replays_missed_messages_before_live_ones(client, auth_tokens):
+    seller_token, buyer_token = auth_tokens
+    client.post("/users/register", json={"username": "third", "email": "third@example.com", "password": "password123"})
+    third_token = client.post("/auth/login", data={"username": "third", "password": "password123"}).json()["access_token"]
+
+    def send(token, receiver_id, content):
+        return client.post("/messages/", headers={"Authorization": f"Bearer {token}"},
+                           json={"receiver_id": receiver_id, "content": content, "advertisement_id": None}).json()
+
+    seen = send(seller_token, 2, "Seen before going offline")
+    send(seller_token, 2, "Missed 1")
+    send(third_token, 2, "Missed 2")
+    send(buyer_token, 1, "Sent from another device")
+
+    with client.websocket_connect(f"/chat/ws/2?token={buyer_token}&last_seen_id={seen['id']}") as websocket:
+        replayed = [websocket.receive_json() for _ in range(3)]
+        complete = websocket.receive_json()
+
+        send(seller_token, 2, "Live")
+        live = websocket.receive_json()
+
+    assert [frame["message"]["content"] for frame in replayed] == ["Missed 1", "Missed 2", "Sent from another device"]
+    assert [frame["message"]["receiver_id"] for frame in replayed] == [2, 2, 1]
+    assert complete == {"type": "replay_complete", "last_id": replayed[-1]["message"]["id"]}
+    assert live["message"]["content"] == "Live"
+
+
+def test_release_drops_live_frames_already_replayed():
+    def new_message(message_id):
+        return json.dumps({"type": "new_message", "message": {"id": message_id}}).encode()
+
+    async def scenario():
+        connection = Connection(websocket=None, user_id=1, queue_size=10, hold=True)
+        for payload in (new_message(4), new_message(5), b'{"type": "ping"}', new_message(6)):
+            assert connection.offer(payload)
+        assert connection.queue.empty()
+
+        assert await connection.push(new_message(3))
+        assert connection.release(replayed_up_to=5)
+        return [connection.queue.get_nowait() for _ in range(connection.queue.qsize())]
+
+    assert asyncio.run(scenario()) == [new_message(3), b'{"type": "ping"}', new_message(6)]
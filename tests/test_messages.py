@@ -303,4 +303,233 @@ def test_chat_auto_creation(client, auth_token):
 
     chat_id_2 = response2.json()["chat_id"]
 
-    assert chat_id_1 == chat_id_2
\ No newline at end of file
+    assert chat_id_1 == chat_id_2
+
+def test_get_conversations_query_count_is_constant(client, auth_token):
+    from sqlalchemy import event
+    from tests.conftest import async_engine, engine
+
+    def send_to_new_user(n):
+        client.post("/users/register", json={
+            "username": f"trader{n}",
+            "email": f"trader{n}@example.com",
+            "password": "password123"
+        })
+        client.post("/messages/",
+                    headers={"Authorization": f"Bearer {auth_token}"},
+                    json={"receiver_id": n + 2, "content": f"Hello trader{n}", "advertisement_id": None})
+
+    def count_queries():
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", capture)
+        try:
+            response = client.get("/messages/conversations",
+                                  headers={"Authorization": f"Bearer {auth_token}"})
+        finally:
+            for target in (engine, async_engine.sync_engine):
+                event.remove(target, "before_cursor_execute", capture)
+        return response.json(), len(statements)
+
+    send_to_new_user(0)
+    conversations, baseline = count_queries()
+    assert len(conversations) == 1
+
+    for n in range(1, 6):
+        send_to_new_user(n)
+    conversations, queries = count_queries()
+
+    assert queries == baseline == 1
+    assert [c["other_username"] for c in conversations] == [f"trader{n}" for n in range(5, -1, -1)]
+    assert conversations[0]["last_message"] == "Hello trader5"
+
+    client.post("/messages/",
+                headers={"Authorization": f"Bearer {auth_token}"},
+                json={"receiver_id": 2, "content": "Still available?", "advertisement_id": None})
+    conversations, _ = count_queries()
+    assert conversations[0]["other_username"] == "trader0"
+    assert conversations[0]["last_message"] == "Still available?"
+
+
+def test_find_or_create_chat_recovers_from_concurrent_insert(client, auth_token, monkeypatch):
+    from app.api import messages
+    from app.models.chat import Chat
+    from tests.conftest import TestingSessionLocal
+
+    client.post("/users/register", json={
+        "username": "racer",
+        "email": "racer@example.com",
+        "password": "password123"
+    })
+
+    db = TestingSessionLocal()
+    winner = messages.find_or_create_chat(2, 1, db)
+    db.commit()
+    assert (winner.user_low_id, winner.user_high_id) == (1, 2)
+
+    lookups = []
+    find_chat = messages.find_chat
+
+    def stale_find_chat(user1_id, user2_id, session):
+        lookups.append((user1_id, user2_id))
+        return None if len(lookups) == 1 else find_chat(user1_id, user2_id, session)
+
+    monkeypatch.setattr(messages, "find_chat", stale_find_chat)
+    other_db = TestingSessionLocal()
+    chat = messages.find_or_create_chat(1, 2, other_db)
+
+    assert chat.id == winner.id
+    assert len(lookups) == 2
+    assert other_db.query(Chat).count() == 1
+    db.close()
+    other_db.close()
+
+
+def test_created_chat_rolls_back_with_the_callers_transaction(client, auth_token):
+    from app.api import messages
+    from app.models.chat import Chat, ChatParticipant
+    from tests.conftest import TestingSessionLocal
+
+    client.post("/users/register", json={"username": "buyer", "email": "buyer@example.com", "password": "password123"})
+
+    db = TestingSessionLocal()
+    chat = messages.find_or_create_chat(1, 2, db)
+    db.flush()
+    assert chat.id is not None
+    db.rollback()
+    db.close()
+
+    db = TestingSessionLocal()
+    assert db.query(Chat).count() == 0
+    assert db.query(ChatParticipant).count() == 0
+    db.close()
+
+
+def test_migration_merges_duplicate_chats():
+    from sqlalchemy import create_engine, inspect, text
+    from app.db.database import Base
+    from app.db.migrations import run_migrations
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE chats"))
+        connection.execute(text("CREATE TABLE chats (id INTEGER PRIMARY KEY, created_at DATETIME, updated_at DATETIME)"))
+        connection.execute(text("INSERT INTO users (id, username, email, password) VALUES (1, 'a', 'a@x', ''), (2, 'b', 'b@x', '')"))
+        connection.execute(text("INSERT INTO chats (id) VALUES (1), (2), (3)"))
+        connection.execute(text(
+            "INSERT INTO chat_participants (chat_id, user_id) VALUES (1, 2), (1, 1), (2, 1), (2, 2), (3, 1)"
+        ))
+        connection.execute(text(
+            "INSERT INTO messages (id, chat_id, sender_id, content) VALUES (1, 1, 1, 'first'), (2, 2, 2, 'duplicate')"
+        ))
+
+    run_migrations(engine)
+
+    indexes = {index["name"]: index for index in inspect(engine).get_indexes("chats")}
+    assert indexes["ux_chats_user_low_id_user_high_id"]["unique"]
+
+    with engine.connect() as connection:
+        chats = connection.execute(text("SELECT id, user_low_id, user_high_id FROM chats ORDER BY id")).fetchall()
+        assert [tuple(chat) for chat in chats] == [(1, 1, 2), (3, None, None)]
+        assert connection.execute(text("SELECT chat_id FROM messages ORDER BY id")).scalars().all() == [1, 1]
+        assert connection.execute(text("SELECT COUNT(*) FROM chat_participants WHERE chat_id = 2")).scalar() == 0
+
+
+def test_get_conversation_pagination(client, auth_token):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post("/users/register", json={
+        "username": "pen_pal",
+        "email": "penpal@example.com",
+        "password": "password123"
+    })
+    for i in range(7):
+        client.post("/messages/", headers=headers,
+                    json={"receiver_id": 2, "content": f"Message {i}", "advertisement_id": None})
+
+    newest = client.get("/messages/conversation/2?limit=3", headers=headers).json()
+    assert [m["content"] for m in newest] == ["Message 4", "Message 5", "Message 6"]
+
+    older = client.get(f"/messages/conversation/2?limit=3&before_id={newest[0]['id']}", headers=headers).json()
+    assert [m["content"] for m in older] == ["Message 1", "Message 2", "Message 3"]
+
+    oldest = client.get(f"/messages/conversation/2?limit=3&before_id={older[0]['id']}", headers=headers).json()
+    assert [m["content"] for m in oldest] == ["Message 0"]
+
+    client.post("/messages/", headers=headers,
+                json={"receiver_id": 2, "content": "Message 7", "advertisement_id": None})
+    caught_up = client.get(f"/messages/conversation/2?after_id={newest[-1]['id']}", headers=headers).json()
+    assert [m["content"] for m in caught_up] == ["Message 7"]
+
+    response = client.get("/messages/conversation/2?before_id=5&after_id=1", headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_conversation_does_not_create_chat(client, auth_token):
+    client.post("/users/register", json={
+        "username": "lurker",
+        "email": "lurker@example.com",
+        "password": "password123"
+    })
+
+    response = client.get("/messages/conversation/2", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.json() == []
+
+    response = client.get("/messages/conversations", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.json() == []
+
+    from app.models.chat import Chat
+    from tests.conftest import TestingSessionLocal
+    db = TestingSessionLocal()
+    assert db.query(Chat).count() == 0
+    db.close()
+
+
+def test_unread_counts_follow_read_cursor(client, auth_tokens):
+    seller_token, buyer_token = auth_tokens
+    seller = {"Authorization": f"Bearer {seller_token}"}
+    buyer = {"Authorization": f"Bearer {buyer_token}"}
+
+    sent = [
+        client.post("/messages/", headers=buyer,
+                    json={"receiver_id": 1, "content": f"Question {i}", "advertisement_id": None}).json()
+        for i in range(3)
+    ]
+    client.post("/messages/", headers=seller, json={"receiver_id": 2, "content": "Answer", "advertisement_id": None})
+    chat_id = sent[0]["chat_id"]
+
+    def unread(headers):
+        return client.get("/messages/conversations", headers=headers).json()[0]["unread_count"]
+
+    assert unread(seller) == 3
+    assert unread(buyer) == 1
+
+    response = client.post(f"/messages/chat/{chat_id}/read", headers=seller, json={"message_id": sent[1]["id"]})
+    assert response.json() == {"chat_id": chat_id, "last_read_message_id": sent[1]["id"]}
+    assert unread(seller) == 1
+
+    response = client.post(f"/messages/chat/{chat_id}/read", headers=seller, json={"message_id": sent[0]["id"]})
+    assert response.json()["last_read_message_id"] == sent[1]["id"]
+
+    client.post(f"/messages/chat/{chat_id}/read", headers=seller)
+    assert unread(seller) == 0
+    assert unread(buyer) == 1
+
+
+def test_mark_chat_read_forbidden_for_non_participant(client, auth_tokens):
+    seller_token, buyer_token = auth_tokens
+    client.post("/users/register", json={
+        "username": "outsider",
+        "email": "outsider@example.com",
+        "password": "password123"
+    })
+    chat_id = client.post("/messages/", headers={"Authorization": f"Bearer {buyer_token}"},
+                          json={"receiver_id": 3, "content": "Hi", "advertisement_id": None}).json()["chat_id"]
+
+    response = client.post(f"/messages/chat/{chat_id}/read", headers={"Authorization": f"Bearer {seller_token}"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
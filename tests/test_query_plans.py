@@ -0,0 +1,133 @@
+import asyncio
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.websockets.replay import missed_messages
+from tests.conftest import TestingAsyncSessionLocal, async_engine, engine
+
+INDEXED_TABLES = {
+    "advertisements",
+    "advertisement_photos",
+    "chat_participants",
+    "messages",
+    "ratings",
+    "users",
+}
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        for target in (engine, async_engine.sync_engine):
+            event.remove(target, "before_cursor_execute", capture)
+
+
+async def replay_page(user_id):
+    async with TestingAsyncSessionLocal() as db:
+        return await missed_messages(db, user_id, 0, 10)
+
+
+def full_scans(statements):
+    scans = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            for row in plan:
+                match = FULL_SCAN.match(row[-1])
+                if match and match.group(1) in INDEXED_TABLES:
+                    scans.append((row[-1], statement))
+    return scans
+
+
+def seed(client, tokens):
+    seller, buyer = tokens
+    for i in range(3):
+        ad = client.post(
+            "/advertisements/",
+            headers={"Authorization": f"Bearer {seller}"},
+            data={'title': f'Item {i}', 'description': 'Indexed', 'price': '10.00', 'category': 'electronics'},
+            files={'photos': ('a.jpg', b'\xff\xd8\xff\xe0fake image data', 'image/jpeg')}
+        ).json()
+    client.patch(f"/advertisements/{ad['id']}/buy", headers={"Authorization": f"Bearer {buyer}"})
+    client.post(
+        "/ratings/",
+        headers={"Authorization": f"Bearer {buyer}"},
+        json={"reviewed_user_id": 1, "advertisement_id": ad["id"], "rating": 5, "comment": "Great"}
+    )
+    client.post(
+        "/messages/",
+        headers={"Authorization": f"Bearer {buyer}"},
+        json={"receiver_id": 1, "content": "Hello", "advertisement_id": ad["id"]}
+    )
+    return ad
+
+
+def test_listing_queries_use_indexes(client, auth_tokens):
+    seed(client, auth_tokens)
+    cursor = client.get("/advertisements/all?limit=1").json()["next_cursor"]
+    oldest_cursor = client.get("/advertisements/all?limit=1&sort_by=oldest").json()["next_cursor"]
+
+    with captured_statements() as statements:
+        client.get("/advertisements/all")
+        client.get(f"/advertisements/all?limit=1&cursor={cursor}")
+        client.get(f"/advertisements/all?limit=1&sort_by=oldest&cursor={oldest_cursor}")
+        client.get("/advertisements/all?category=electronics&status=available")
+        client.get("/advertisements/all?status=sold")
+        client.get("/advertisements/all?user_id=1")
+        client.get("/advertisements/all?search=item")
+        client.get("/advertisements/all?view=summary")
+        client.get("/advertisements/all?view=summary&rating_sort=rating_high")
+
+    assert statements
+    assert full_scans(statements) == []
+
+
+def test_detail_rating_and_message_queries_use_indexes(client, auth_tokens):
+    seller, buyer = auth_tokens
+    ad = seed(client, auth_tokens)
+
+    with captured_statements() as statements:
+        client.get(f"/advertisements/{ad['id']}")
+        client.get(f"/advertisements/{ad['id']}?view=summary")
+        client.get(ad["photos"][0]["url"])
+        client.get("/ratings/1")
+        client.get("/ratings/reviewer/2")
+        client.get("/messages/conversations", headers={"Authorization": f"Bearer {seller}"})
+        client.get("/messages/conversation/2", headers={"Authorization": f"Bearer {seller}"})
+        client.get("/messages/conversation/2?before_id=10", headers={"Authorization": f"Bearer {seller}"})
+        client.get("/messages/conversation/2?after_id=0", headers={"Authorization": f"Bearer {seller}"})
+        asyncio.run(replay_page(1))
+        client.post(
+            "/messages/",
+            headers={"Authorization": f"Bearer {seller}"},
+            json={"receiver_id": 2, "content": "Reply", "advertisement_id": None}
+        )
+
+    assert statements
+    assert full_scans(statements) == []
+
+
+def test_conversation_list_seeks_last_message_per_chat(client, auth_tokens):
+    seller, buyer = auth_tokens
+    seed(client, auth_tokens)
+
+    with captured_statements() as statements:
+        client.get("/messages/conversations", headers={"Authorization": f"Bearer {seller}"})
+
+    (statement, parameters), = [s for s in statements if "max(" in s[0]]
+    with engine.connect() as connection:
+        plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    assert any("ix_messages_chat_id_id (chat_id=?)" in step for step in plan), plan
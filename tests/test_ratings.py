@@ -60,4 +60,90 @@ def test_create_rating_without_transaction_fails(client, auth_tokens):
 def test_get_user_ratings_empty_list(client):
     response = client.get("/ratings/999")
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == []
\ No newline at end of file
+    assert response.json() == []
+
+def test_create_rating_updates_seller_aggregates(client, auth_tokens):
+    from app.models.user import User
+    from tests.conftest import TestingSessionLocal
+
+    seller_token, buyer_token = auth_tokens
+
+    create_response = client.post(
+        "/advertisements/",
+        headers={"Authorization": f"Bearer {seller_token}"},
+        data={
+            'title': 'Item for Rating',
+            'description': 'Will be rated',
+            'price': '100.00',
+            'category': 'electronics'
+        }
+    )
+    ad_id = create_response.json()["id"]
+
+    client.patch(
+        f"/advertisements/{ad_id}/buy",
+        headers={"Authorization": f"Bearer {buyer_token}"}
+    )
+
+    client.post(
+        "/ratings/",
+        headers={"Authorization": f"Bearer {buyer_token}"},
+        json={
+            "reviewed_user_id": 1,
+            "advertisement_id": ad_id,
+            "rating": 4,
+            "comment": "Good seller"
+        }
+    )
+
+    db = TestingSessionLocal()
+    seller = db.query(User).filter(User.id == 1).first()
+    assert seller.rating_sum == 4
+    assert seller.rating_count == 1
+    assert seller.average_rating == 4.0
+    assert seller.total_reviews == 1
+    db.close()
+
+
+def test_deleting_advertisement_removes_its_ratings_from_aggregates(client, auth_tokens):
+    from app.models.user import User
+    from tests.conftest import TestingSessionLocal
+
+    seller_token, buyer_token = auth_tokens
+    seller_headers = {"Authorization": f"Bearer {seller_token}"}
+    buyer_headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    def sell(title):
+        ad_id = client.post("/advertisements/", headers=seller_headers, data={
+            'title': title,
+            'description': 'Will be rated',
+            'price': '100.00',
+            'category': 'electronics'
+        }).json()["id"]
+        client.patch(f"/advertisements/{ad_id}/buy", headers=buyer_headers)
+        return ad_id
+
+    deleted_id, kept_id = sell('Deleted later'), sell('Kept')
+    for headers, reviewed_user_id, ad_id, rating in (
+            (buyer_headers, 1, deleted_id, 5),
+            (seller_headers, 2, deleted_id, 2),
+            (buyer_headers, 1, kept_id, 3),
+    ):
+        client.post("/ratings/", headers=headers, json={
+            "reviewed_user_id": reviewed_user_id,
+            "advertisement_id": ad_id,
+            "rating": rating,
+            "comment": "Rated"
+        })
+    assert client.get("/advertisements/all?view=summary").json()["items"][0]["seller"]["average_rating"] == 4.0
+
+    assert client.delete(f"/advertisements/{deleted_id}", headers=seller_headers).status_code == status.HTTP_200_OK
+
+    db = TestingSessionLocal()
+    seller, buyer = db.get(User, 1), db.get(User, 2)
+    assert (seller.rating_sum, seller.rating_count) == (3, 1)
+    assert (buyer.rating_sum, buyer.rating_count) == (0, 0)
+    db.close()
+    assert [rating["rating"] for rating in client.get("/ratings/1").json()] == [3]
+    seller_summary = client.get("/advertisements/all?view=summary").json()["items"][0]["seller"]
+    assert (seller_summary["average_rating"], seller_summary["total_reviews"]) == (3.0, 1)